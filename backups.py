@@ -0,0 +1,181 @@
+"""Online backups of the game database, and restoring one.
+
+    python backups.py create
+    python backups.py list
+    python backups.py restore backups/cryptic_hunt2025-20250806-181500.db
+
+Backups are taken with the SQLite backup API a few pages at a time, sleeping
+between steps so player writes keep getting the database. They are written to
+CRYPTIC_HUNT_BACKUP_DIR and only the newest CRYPTIC_HUNT_BACKUP_KEEP are kept.
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+import database
+
+BACKUP_DIR = os.environ.get("CRYPTIC_HUNT_BACKUP_DIR", "backups")
+BACKUP_KEEP = int(os.environ.get("CRYPTIC_HUNT_BACKUP_KEEP", "12"))
+# Seconds between scheduled backups; 0 turns the schedule off. run_workers.py
+# schedules them in its own process and sets this to 0 for the workers.
+BACKUP_INTERVAL_SEC = float(os.environ.get("CRYPTIC_HUNT_BACKUP_INTERVAL", "900"))
+
+# Each step copies this many pages (4 KiB each) and then yields for a moment
+PAGES_PER_STEP = int(os.environ.get("CRYPTIC_HUNT_BACKUP_PAGES", "256"))
+STEP_PAUSE_SEC = float(os.environ.get("CRYPTIC_HUNT_BACKUP_PAUSE", "0.005"))
+
+
+class BackupResult:
+    def __init__(self, path, seconds, steps, size):
+        self.path = path
+        self.seconds = seconds
+        self.steps = steps
+        self.size = size
+
+
+def _stem():
+    return os.path.splitext(os.path.basename(database.DATABASE_FILE))[0]
+
+
+# Newest first
+def list_backups(directory=BACKUP_DIR):
+    return sorted(glob.glob(os.path.join(directory, f"{_stem()}-*.db")), key=os.path.getmtime, reverse=True)
+
+
+def _new_backup_path(directory):
+    base = os.path.join(directory, f"{_stem()}-{time.strftime('%Y%m%d-%H%M%S')}")
+    path, n = base + ".db", 1
+    while os.path.exists(path):
+        path, n = f"{base}-{n}.db", n + 1
+    return path
+
+
+# Copy the live database to a new timestamped file in `directory`. The source
+# connection holds one read transaction for the whole copy, so every step sees
+# the same WAL snapshot: commits made meanwhile neither block on the backup nor
+# restart it, and the file is the database as of the moment the backup began.
+def create_backup(directory=BACKUP_DIR, pages=PAGES_PER_STEP, pause=STEP_PAUSE_SEC, keep=BACKUP_KEEP):
+    os.makedirs(directory, exist_ok=True)
+    path = _new_backup_path(directory)
+    partial = path + ".partial"
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        time.sleep(pause)
+
+    start = time.perf_counter()
+    source = database.get_db_connection()
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchall()
+        target = sqlite3.connect(partial)
+        try:
+            source.backup(target, pages=pages, progress=progress)
+            # A standalone file: opening it later should not leave -wal/-shm files beside it
+            target.execute("PRAGMA journal_mode = DELETE")
+            if target.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise sqlite3.DatabaseError("backup failed its integrity check")
+        finally:
+            target.close()
+        os.replace(partial, path)
+    finally:
+        source.rollback()
+        source.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    prune_backups(directory, keep)
+    return BackupResult(path, time.perf_counter() - start, steps, os.path.getsize(path))
+
+
+def prune_backups(directory=BACKUP_DIR, keep=BACKUP_KEEP):
+    for old in list_backups(directory)[keep:]:
+        os.remove(old)
+
+
+# Replace the live database's contents with a backup. The current state is
+# backed up first, so a restore can itself be undone. Version counters are
+# moved past their current values so every worker drops its caches.
+def restore_backup(path, directory=BACKUP_DIR):
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    safety = create_backup(directory, keep=BACKUP_KEEP + 1)
+
+    conn = database.get_db_connection()
+    try:
+        versions = conn.execute("SELECT version, questions_version FROM last_update WHERE id = 1").fetchone()
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            source.backup(conn)
+        finally:
+            source.close()
+        database.apply_migrations(conn)
+        conn.execute("""
+            UPDATE last_update
+            SET version = MAX(version, ?) + 1, questions_version = MAX(questions_version, ?) + 1
+            WHERE id = 1
+        """, versions)
+        conn.commit()
+    finally:
+        conn.close()
+    database.leaderboard_cache.invalidate()
+    database.questions_cache.invalidate()
+    return safety.path
+
+
+# Takes a backup every `interval` seconds until stopped
+class BackupScheduler:
+    def __init__(self, interval=BACKUP_INTERVAL_SEC, directory=BACKUP_DIR):
+        self.interval = interval
+        self.directory = directory
+        self.last = None
+        self.failures = 0
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name="backups", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last = create_backup(self.directory)
+            except Exception as e:
+                self.failures += 1
+                print(f"Error creating backup: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DATABASE_FILE)
+    parser.add_argument("--dir", default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create")
+    commands.add_parser("list")
+    restore = commands.add_parser("restore")
+    restore.add_argument("path")
+    args = parser.parse_args()
+
+    database.DATABASE_FILE = args.db
+    if args.command == "create":
+        result = create_backup(args.dir)
+        print(f"{result.path}: {result.size / 1024:.0f} KiB in {result.seconds:.2f}s "
+              f"({result.steps} steps)")
+    elif args.command == "list":
+        for path in list_backups(args.dir):
+            print(f"{path}  {os.path.getsize(path) / 1024:.0f} KiB")
+    else:
+        safety = restore_backup(args.path, args.dir)
+        print(f"restored {args.path} (previous state saved as {safety})")
+
+
+if __name__ == "__main__":
+    main()
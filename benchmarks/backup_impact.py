@@ -0,0 +1,112 @@
+"""Player write latency while an online backup runs.
+
+    python -m benchmarks.backup_impact --users 20000 --seconds 10
+
+Writer threads keep advancing random players for a fixed time in each mode
+while another thread takes a backup, waits --gap seconds, and repeats:
+
+    idle      no backup running (baseline)
+    stepped   backups.create_backup: small page steps with a pause between
+    one-step  the backup API copying the whole file in a single step
+    locked    a plain file copy while holding the write lock, for contrast
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import backups
+import database
+from benchmarks.common import summarize, temp_database
+from benchmarks.eventgen import EventProfile, populate
+
+
+def locked_copy(directory):
+    conn = database.get_db_connection()
+    try:
+        start = time.perf_counter()
+        database.begin_write(conn)
+        for suffix in ("", "-wal"):
+            shutil.copyfile(database.DATABASE_FILE + suffix, os.path.join(directory, "locked.db" + suffix))
+        conn.rollback()
+        return backups.BackupResult(None, time.perf_counter() - start, 1, 0)
+    finally:
+        conn.close()
+
+
+def run(args, mode, directory):
+    stop_at = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    writes, runs, failures = [], [], []
+
+    def writer(seed):
+        rng = random.Random(seed)
+        local = []
+        while time.perf_counter() < stop_at:
+            username = f"player{rng.randrange(args.users):06d}"
+            level = database.get_player_level(username)
+            start = time.perf_counter()
+            try:
+                database.update_user_progress(username, level)
+            except sqlite3.OperationalError:
+                failures.append(username)
+            local.append(time.perf_counter() - start)
+            time.sleep(args.think)
+        with lock:
+            writes.extend(local)
+
+    def backer():
+        while time.perf_counter() < stop_at:
+            if mode == "stepped":
+                runs.append(backups.create_backup(directory, keep=1))
+            elif mode == "one-step":
+                runs.append(backups.create_backup(directory, pages=-1, pause=0, keep=1))
+            else:
+                runs.append(locked_copy(directory))
+            time.sleep(args.gap)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    if mode != "idle":
+        threads.append(threading.Thread(target=backer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(writes), runs, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--think", type=float, default=0.002, help="pause between a writer's updates")
+    parser.add_argument("--gap", type=float, default=0.5, help="pause between backups")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cryptic_hunt_backups_")
+    try:
+        with temp_database("backup_impact.db") as path:
+            populate(EventProfile(users=args.users, rounds=20), args.seed)
+            print(f"{args.users} users, {os.path.getsize(path) / 1024 / 1024:.1f} MB database, "
+                  f"{backups.PAGES_PER_STEP} pages per step, {backups.STEP_PAUSE_SEC * 1000:.0f} ms pause\n")
+            for mode in ("idle", "stepped", "one-step", "locked"):
+                stats, runs, failed = run(args, mode, directory)
+                line = (f"{mode:<9} writes n={stats['count']:<6} p50={stats['p50_ms']:.1f}ms "
+                        f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms max={stats['max_ms']:.1f}ms "
+                        f"failed={failed}")
+                if runs:
+                    line += (f"  | {len(runs)} backups, avg {sum(r.seconds for r in runs) / len(runs):.2f}s, "
+                             f"{sum(r.steps for r in runs) // len(runs)} steps each")
+                print(line)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Micro-benchmarks for the database helpers at several data sizes.
+
+    python -m benchmarks.bench_db                      # all scales
+    python -m benchmarks.bench_db --scales 1k 10k
+    python -m benchmarks.bench_db --baseline benchmarks/results/db-<earlier>.json
+
+Every scale gets its own SQLite file, filled by benchmarks.eventgen with a fixed
+seed so runs are comparable. Each helper is timed once "cold", the first call
+after the worker caches are cleared, and then "warm" over several repeats. Results are written as JSON to
+benchmarks/results/, and --baseline prints the change against an earlier run.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import time
+
+import database
+from benchmarks.common import percentile, player_names, temp_database
+from benchmarks.eventgen import EventProfile, populate
+
+# Players per scale. About ten rounds solved per player gives roughly
+# 10k / 100k / 1M leaderboard rows.
+SCALES = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+}
+ROUNDS = 20
+EVENT_HOURS = 3.5
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def time_call(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+# Each case gets a fresh argument per call, so writes never repeat on the same
+# row while there are enough players; `calls` is how often each case is run
+def cases(users, calls, rng):
+    names = player_names(users, calls * 4, rng)  # four cases take a player
+
+    def next_user():
+        return next(names)
+
+    def progress_args():
+        username = next_user()
+        return username, database.get_player_level(username)
+
+    return [
+        ("load_questions", database.load_questions, lambda: ()),
+        ("load_leaderboard", database.load_leaderboard, lambda: ()),
+        ("get_player_rank", database.get_player_rank, lambda: (next_user(),)),
+        ("get_current_leaderboard", database.get_current_leaderboard, lambda: ()),
+        ("load_players", database.load_players, lambda: ()),
+        ("update_user_progress", database.update_user_progress, progress_args),
+        ("reset_player_progress", database.reset_player_progress, lambda: (next_user(),)),
+        ("delete_player", database.delete_player, lambda: (next_user(),)),
+    ]
+
+
+def bench_scale(name, repeats, seed):
+    users = SCALES[name]
+    rng = random.Random(seed)
+    with temp_database(f"bench_{name}.db"):
+        start = time.perf_counter()
+        _, stored_rows = populate(EventProfile(users=users, rounds=ROUNDS, event_hours=EVENT_HOURS), seed)
+        seed_seconds = time.perf_counter() - start
+
+        results = {}
+        for helper, fn, make_args in cases(users, repeats + 1, rng):
+            database.leaderboard_cache.invalidate()
+            database.questions_cache.invalidate()
+            cold = time_call(fn, *make_args())
+            warm = [time_call(fn, *make_args()) for _ in range(repeats)]
+            results[helper] = {
+                "cold_ms": cold * 1000,
+                "warm_p50_ms": percentile(warm, 50) * 1000,
+                "warm_min_ms": min(warm) * 1000,
+                "warm_max_ms": max(warm) * 1000,
+            }
+            print(f"  {name:>5} {helper:<24} cold {cold * 1000:9.2f} ms   "
+                  f"warm p50 {results[helper]['warm_p50_ms']:9.2f} ms")
+
+    return {"users": users, "leaderboard_rows": stored_rows,
+            "seed_seconds": seed_seconds, "helpers": results}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"change against {baseline_path} (warm p50, >1.00 is slower):")
+    for scale, result in report["scales"].items():
+        before = baseline.get("scales", {}).get(scale)
+        if not before:
+            continue
+        for helper, stats in result["helpers"].items():
+            old = before["helpers"].get(helper)
+            if old and old["warm_p50_ms"] > 0:
+                ratio = stats["warm_p50_ms"] / old["warm_p50_ms"]
+                flag = "  <-- regression" if ratio > 1.5 else ""
+                print(f"  {scale:>5} {helper:<24} {ratio:6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+              "repeats": args.repeats, "scales": {}}
+    for name in args.scales:
+        report["scales"][name] = bench_scale(name, args.repeats, args.seed)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"db-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
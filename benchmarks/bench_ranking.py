@@ -0,0 +1,118 @@
+"""Ranking engine against the previous SQL window query and pandas formatting.
+
+    python -m benchmarks.bench_ranking --users 100000
+
+Builds one event database, then times each stage of producing the leaderboard
+two ways. The legacy path ranks with a window query and formats rank, medal
+and percentile row by row with pandas apply, as the views used to. The engine
+path loads one row per player and ranks it with ranking.Standings. Both
+orderings are checked to agree before anything is reported.
+"""
+import argparse
+import json
+import time
+
+import pandas as pd
+
+import database
+from benchmarks.common import percentile, temp_database
+from benchmarks.eventgen import EventProfile, populate
+from ranking import Standings
+
+LEGACY_SQL = """
+    WITH UserRounds AS (
+        SELECT username, level, timestamp,
+               ROW_NUMBER() OVER (PARTITION BY username ORDER BY level DESC, timestamp ASC) as rn
+        FROM leaderboard
+    )
+    SELECT username, level, timestamp,
+           ROW_NUMBER() OVER (ORDER BY level DESC, timestamp ASC) as position
+    FROM UserRounds
+    WHERE rn = 1
+    ORDER BY level DESC, timestamp ASC
+"""
+
+
+def legacy_query():
+    conn = database.get_db_connection()
+    rows = conn.execute(LEGACY_SQL).fetchall()
+    conn.close()
+    return pd.DataFrame(rows, columns=["Username", "Round", "Timestamp", "Position"])
+
+
+# What update_game_leaderboard did per rerun, plus percentile for every player
+def legacy_format(df):
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    display_df = df.copy()
+    display_df["Rank"] = display_df["Position"].apply(lambda x: f"#{x}")
+    display_df["Player"] = display_df.apply(
+        lambda row: f"{medals.get(row['Position'], '')} {row['Username']}"
+        if row["Position"] <= 3 else row["Username"], axis=1)
+    total = len(display_df)
+    display_df["Percentile"] = display_df["Position"].apply(lambda p: round((p / total) * 100))
+    return display_df
+
+
+def legacy_lookup(df, username):
+    user_data = df[df["Username"] == username]
+    return user_data.iloc[0]["Position"] if not user_data.empty else None
+
+
+def median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return percentile(samples, 50) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    with temp_database("bench_ranking.db"):
+        _, rows = populate(EventProfile(users=args.users, rounds=20, event_hours=3.5), args.seed)
+        legacy_df = legacy_query()
+        standings = database.load_standings()
+        if list(legacy_df["Round"]) != standings.levels.tolist() or \
+                list(legacy_df["Timestamp"]) != standings.timestamps.tolist():
+            raise SystemExit("Error: engine ordering differs from the window query")
+        probe = standings.usernames[len(standings) // 2]
+        arrays = (standings.usernames, standings.levels, standings.timestamps)
+
+        results = {
+            "legacy": {
+                "query": median_ms(legacy_query, args.repeats),
+                "format": median_ms(lambda: legacy_format(legacy_df), args.repeats),
+                "rank_of": median_ms(lambda: legacy_lookup(legacy_df, probe), args.repeats),
+            },
+            "engine": {
+                "query": median_ms(database.load_standings, args.repeats),
+                "rank": median_ms(lambda: Standings(*arrays), args.repeats),
+                "format": median_ms(lambda: Standings(*arrays).frame(), args.repeats),
+                "rank_of": median_ms(lambda: standings.rank_of(probe), args.repeats),
+                "export": median_ms(lambda: Standings(*arrays).to_csv(), args.repeats),
+            },
+        }
+
+    print(f"{args.users} users, {rows} leaderboard rows, {len(standings)} ranked players\n")
+    for path, stages in results.items():
+        for stage, ms in stages.items():
+            print(f"  {path:<8}{stage:<10}{ms:>10.2f} ms")
+    legacy_total = results["legacy"]["query"] + results["legacy"]["format"]
+    engine_total = results["engine"]["query"] + results["engine"]["format"]
+    print(f"\n  query + format: {legacy_total:.0f} ms -> {engine_total:.0f} ms "
+          f"({legacy_total / engine_total:.1f}x)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "leaderboard_rows": rows, "results_ms": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
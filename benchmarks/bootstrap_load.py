@@ -0,0 +1,98 @@
+"""Load test for player bootstrap: N players press "Start Playing" at once.
+
+Run from the repository root:
+
+    python -m benchmarks.bootstrap_load --players 1000
+"""
+import argparse
+import sqlite3
+import threading
+import time
+
+import database
+from benchmarks.common import summarize, temp_database
+
+
+# The check-then-insert flow the "Start Playing" handler used before bootstrap_player
+def legacy_bootstrap(username):
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT level FROM users WHERE username = ?", (username,))
+    result = cursor.fetchone()
+    if result:
+        level = result[0]
+    else:
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)",
+                       (username, "dummy_password"))
+        conn.commit()
+        level = 0
+    conn.close()
+    return level
+
+
+def run(join, players, returning_ratio):
+    # Some names are repeated to model reloads and returning players
+    distinct = max(1, int(players * (1 - returning_ratio)))
+    names = [f"player{i % distinct}" for i in range(players)]
+
+    barrier = threading.Barrier(players)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(name):
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            join(name)
+        except sqlite3.Error as e:
+            with lock:
+                errors.append(type(e).__name__ + ": " + str(e))
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in names]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    conn = database.get_db_connection()
+    stored = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    conn.close()
+
+    result = summarize(latencies)
+    result.update({
+        "wall_s": wall,
+        "joins_per_s": len(latencies) / wall if wall else 0.0,
+        "errors": len(errors),
+        "distinct_players": distinct,
+        "users_rows": stored,
+    })
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--returning-ratio", type=float, default=0.2,
+                        help="fraction of joins that reuse an existing name")
+    args = parser.parse_args()
+
+    for label, join in [("legacy select+insert", legacy_bootstrap),
+                        ("bootstrap_player upsert", database.bootstrap_player)]:
+        with temp_database():
+            result = run(join, args.players, args.returning_ratio)
+        print(f"{label}:")
+        for key, value in result.items():
+            print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Fail if an index is missing or a hot query full-scans a watched table.
+
+    python -m benchmarks.check_indexes
+    python -m benchmarks.check_indexes --db cryptic_hunt2025.db
+
+Checks that every index in database.MANAGED_INDEXES exists, then runs
+sqltrace.assert_uses_index against every statement in
+database.HOT_QUERIES (the standings read, the player level lookup and the
+compare-and-set that advances a player), on a freshly populated event database
+by default or on an existing file with --db. Exits non-zero on either, so
+a migration or query change that loses an index fails here instead of in
+production.
+"""
+import argparse
+import sys
+
+import database
+import sqltrace
+from benchmarks.common import temp_database
+from benchmarks.eventgen import EventProfile, populate
+
+
+# Missing indexes and the names of hot queries that full-scan a watched
+# table, printing each plan
+def check(conn):
+    failed = database.missing_indexes(conn)
+    for index in failed:
+        print(f"FAIL missing index {index}")
+    for name, sql, parameters in database.HOT_QUERIES:
+        try:
+            plan = sqltrace.assert_uses_index(conn, sql, parameters)
+        except AssertionError as e:
+            print(f"FAIL {name}: {e}")
+            failed.append(name)
+            continue
+        print(f"ok   {name}: {'; '.join(plan)}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="check this database instead of a generated one")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.db:
+        conn = sqltrace.connect(args.db)
+        try:
+            failed = check(conn)
+        finally:
+            conn.close()
+    else:
+        with temp_database("check_indexes.db"):
+            populate(EventProfile(users=args.users), args.seed)
+            conn = database.get_db_connection()
+            try:
+                failed = check(conn)
+            finally:
+                conn.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
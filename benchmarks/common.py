@@ -0,0 +1,52 @@
+import contextlib
+import os
+import shutil
+import tempfile
+
+import database
+
+
+# Point the database module at a throwaway file for the duration of a run
+@contextlib.contextmanager
+def temp_database(name="bench.db"):
+    directory = tempfile.mkdtemp(prefix="cryptic_hunt_")
+    previous = database.DATABASE_FILE
+    database.DATABASE_FILE = os.path.join(directory, name)
+    database.leaderboard_cache.invalidate()
+    database.questions_cache.invalidate()
+    try:
+        database.initialize_db()
+        yield database.DATABASE_FILE
+    finally:
+        database.DATABASE_FILE = previous
+        database.leaderboard_cache.invalidate()
+        database.questions_cache.invalidate()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# Nearest-rank percentile of an unsorted list of samples
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+    }
+
+
+# Usernames from eventgen's population, without repeats for the first `count`
+# draws (so writes land on different rows) and at random after that
+def player_names(users, count, rng):
+    for i in rng.sample(range(users), min(users, count)):
+        yield f"player{i:06d}"
+    while True:
+        yield f"player{rng.randrange(users):06d}"
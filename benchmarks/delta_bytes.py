@@ -0,0 +1,108 @@
+"""Bytes per leaderboard update: full bodies against row-level deltas.
+
+    python -m benchmarks.delta_bytes --users 20000 --updates 200
+
+Builds one event database, then advances random players through the real
+write path and, after every --solves of them, takes the new leaderboard
+version. For each version it measures what a client that has the version
+--gap updates back is sent both ways: the full JSON standings against the
+delta from deltas.py, and the projector's whole table against its changed
+rows, raw and gzipped. Every delta is applied to the old standings and
+checked against the new ones before anything is reported.
+"""
+import argparse
+import gzip
+import json
+import random
+
+import database
+import spectator
+from benchmarks.common import temp_database
+from benchmarks.eventgen import EventProfile, populate
+from deltas import DeltaLog
+from leaderboard_api import encode
+
+
+# Player order after applying a delta payload to `old` (rank-ordered usernames)
+def apply(old, payload):
+    gone = set(payload["removed"]) | {row[0] for row in payload["moved"]}
+    players = [player for player in old if player not in gone]
+    for player, position, _, _ in sorted(payload["moved"] + payload["new"], key=lambda row: row[1]):
+        players.insert(position - 1, player)
+    return players
+
+
+def advance(rng, usernames, count):
+    for username in rng.sample(usernames, min(count, len(usernames))):
+        database.update_user_progress(username, database.get_player_level(username))
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    log = DeltaLog()
+    usernames = [username for username, _ in database.load_players()]
+    history = []
+    sizes = {name: [] for name in ("full", "full_gz", "delta", "delta_gz", "table", "table_gz",
+                                   "rows", "rows_gz")}
+    for _ in range(args.updates):
+        advance(rng, usernames, args.solves)
+        version, standings = database.versioned_standings(fresh=True)
+        log.record(version, standings)
+        history.append((version, standings))
+        if len(history) <= args.gap:
+            continue
+        since, old = history[-1 - args.gap]
+
+        full = encode(version, standings)
+        delta = log.since(since, version, standings)
+        body = delta.encode() if delta is not None else full
+        if delta is not None and apply(old.usernames.tolist(), delta.payload()) != standings.usernames.tolist():
+            raise AssertionError(f"delta {since}->{version} does not reproduce the standings")
+        table = spectator.render_rows(version, standings)
+        rows = spectator.render_changed_rows(version, standings, old) or table
+
+        for name, value in (("full", full), ("delta", body), ("table", table), ("rows", rows)):
+            sizes[name].append(len(value))
+            sizes[name + "_gz"].append(len(gzip.compress(value, compresslevel=6)))
+
+    measured = len(sizes["full"])
+    return {
+        "players": len(standings),
+        "updates": measured,
+        "solves_per_update": args.solves,
+        "gap": args.gap,
+        "deltas": log.deltas,
+        "fallbacks": log.fallbacks,
+        "mean_bytes": {name: sum(values) / max(measured, 1) for name, values in sizes.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--solves", type=int, default=1, help="solves between leaderboard versions")
+    parser.add_argument("--gap", type=int, default=1, help="how many versions behind the client is")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    with temp_database():
+        populate(EventProfile(users=args.users, rounds=args.rounds), args.seed)
+        report = run(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    mean = report["mean_bytes"]
+    print(f"{report['players']} players, {report['updates']} updates of {report['solves_per_update']} "
+          f"solve(s), client {report['gap']} version(s) behind")
+    print(f"  deltas={report['deltas']} full fallbacks={report['fallbacks']}")
+    for full, delta, label in (("full", "delta", "JSON standings"), ("table", "rows", "projector table")):
+        print(f"  {label:<16} full {mean[full]:>10.0f} B ({mean[full + '_gz']:>8.0f} gzipped)   "
+              f"delta {mean[delta]:>8.0f} B ({mean[delta + '_gz']:>6.0f} gzipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Synthetic event data in the app's schema, for benchmarks and load tests.
+
+    python -m benchmarks.eventgen out.db --users 10000 --rounds 30 --seed 7
+
+The model, all of it controlled by EventProfile:
+
+* Player skill is log-normal, so most players are average and a few are
+  much faster or much slower.
+* Each round is harder than the one before it. The mean solve time grows
+  geometrically from `first_round_minutes`.
+* Arrivals come in a burst at the start of the event. The rest of the
+  players trickle in over the event, and stragglers only turn up in its
+  last part.
+* At every round a player may give up. Nobody keeps solving after the
+  event ends.
+
+Output depends only on the profile and the seed, so two runs with the same
+arguments produce the same database.
+"""
+import argparse
+import json
+import math
+import random
+import sqlite3
+import time
+
+import database
+
+
+class EventProfile:
+    def __init__(self, users=1000, rounds=20, event_hours=6.0,
+                 skill_sigma=0.5, first_round_minutes=4.0, difficulty_growth=1.15,
+                 solve_time_sigma=0.6, burst_ratio=0.7, burst_minutes=10.0,
+                 straggler_ratio=0.1, give_up_per_round=0.03):
+        self.users = users
+        self.rounds = rounds
+        self.event_hours = event_hours
+        self.skill_sigma = skill_sigma  # spread of log(skill)
+        self.first_round_minutes = first_round_minutes  # mean solve time of round 0 at skill 1
+        self.difficulty_growth = difficulty_growth  # solve time multiplier per round
+        self.solve_time_sigma = solve_time_sigma  # randomness of a single solve
+        self.burst_ratio = burst_ratio  # share of players who join in the opening burst
+        self.burst_minutes = burst_minutes  # mean arrival delay within the burst
+        self.straggler_ratio = straggler_ratio  # share who join in the last quarter
+        self.give_up_per_round = give_up_per_round
+
+    def round_minutes(self, level):
+        return self.first_round_minutes * self.difficulty_growth ** level
+
+
+def _arrival(profile, rng, duration):
+    roll = rng.random()
+    if roll < profile.burst_ratio:
+        return min(duration, rng.expovariate(1 / (profile.burst_minutes * 60)))
+    if roll < profile.burst_ratio + profile.straggler_ratio:
+        return rng.uniform(0.75 * duration, duration)
+    return rng.uniform(0, 0.75 * duration)
+
+
+# Yields (username, final_level, [(level, unix_time), ...]) for every player
+def simulate(profile, seed=0, start=None):
+    rng = random.Random(seed)
+    start = start if start is not None else time.time() - profile.event_hours * 3600
+    duration = profile.event_hours * 3600
+    # Keeps the mean solve time at first_round_minutes for an average player
+    solve_mu_shift = -profile.solve_time_sigma ** 2 / 2
+
+    for i in range(profile.users):
+        skill = rng.lognormvariate(0, profile.skill_sigma)
+        t = _arrival(profile, rng, duration)
+        solves = []
+        for level in range(profile.rounds):
+            mean = profile.round_minutes(level) * 60 / skill
+            t += mean * rng.lognormvariate(solve_mu_shift, profile.solve_time_sigma)
+            if t > duration or rng.random() < profile.give_up_per_round:
+                break
+            solves.append((level + 1, start + t))
+        yield f"player{i:06d}", len(solves), solves
+
+
+def epoch_ms(unix_time):
+    # Same representation as the leaderboard's DEFAULT expression (UTC epoch milliseconds)
+    return int(round(unix_time * 1000))
+
+
+# Write a generated event straight into an initialized database, in one transaction
+def generate_event(conn, profile, seed=0, start=None):
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    cursor.executemany(
+        "INSERT OR REPLACE INTO questions (level, question, answer, hints) VALUES (?, ?, ?, ?)",
+        [(level, f"Question {level}", f"answer{level}", json.dumps([f"Hint for {level}", "", ""]))
+         for level in range(profile.rounds)])
+
+    users = []
+    leaderboard = []
+    for username, level, solves in simulate(profile, seed, start):
+        users.append((username, "dummy_password", level))
+        leaderboard.extend((username, reached, epoch_ms(t)) for reached, t in solves)
+
+    cursor.executemany("INSERT INTO users (username, password, level) VALUES (?, ?, ?)", users)
+    cursor.executemany("INSERT INTO leaderboard (username, level, timestamp) VALUES (?, ?, ?)",
+                       leaderboard)
+    conn.commit()
+    return len(users), len(leaderboard)
+
+
+# Convenience for benchmarks: fill the database the database module points at
+def populate(profile, seed=0):
+    conn = database.get_db_connection()
+    try:
+        return generate_event(conn, profile, seed)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="database file to create or extend")
+    parser.add_argument("--seed", type=int, default=0)
+    defaults = EventProfile()
+    for name, value in vars(defaults).items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(value), default=value)
+    args = parser.parse_args()
+
+    profile = EventProfile(**{name: getattr(args, name) for name in vars(defaults)})
+    database.DATABASE_FILE = args.path
+    database.initialize_db()
+    start = time.perf_counter()
+    users, rows = populate(profile, args.seed)
+    elapsed = time.perf_counter() - start
+
+    conn = sqlite3.connect(args.path)
+    per_level = conn.execute("SELECT level, COUNT(*) FROM users GROUP BY level ORDER BY level").fetchall()
+    conn.close()
+    print(f"{users} users, {rows} leaderboard rows in {elapsed:.1f}s")
+    peak = max(count for _, count in per_level) if per_level else 1
+    for level, count in per_level:
+        print(f"  round {level:>3}: {count:>7} {'#' * math.ceil(40 * count / peak)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Before/after query plans and timings for the migration-managed indexes.
+
+    python -m benchmarks.index_report --users 100000
+
+Builds one event database (about ten leaderboard rows per player), then times
+the hot helpers twice: once with the covering indexes from migration 3 dropped,
+and once after re-running that migration. The query plans sqltrace captured in
+each phase are printed next to the timings.
+"""
+import argparse
+import json
+import random
+import time
+
+import database
+import sqltrace
+from benchmarks.common import percentile, player_names, temp_database
+from benchmarks.eventgen import EventProfile, populate
+
+# Indexes created by migration 3, the one under test
+MIGRATION = 3
+INDEXES = ("idx_leaderboard_user_level_ts", "idx_leaderboard_level_ts", "idx_users_level")
+
+
+def helpers(users, repeats, rng):
+    names = player_names(users, repeats * 3, rng)  # three helpers take a player
+    return [
+        ("load_leaderboard", database.load_leaderboard, lambda: ()),
+        ("get_player_rank", database.get_player_rank, lambda: (next(names),)),
+        ("get_current_leaderboard", database.get_current_leaderboard, lambda: ()),
+        ("load_players", database.load_players, lambda: ()),
+        ("reset_player_progress", database.reset_player_progress, lambda: (next(names),)),
+        ("delete_player", database.delete_player, lambda: (next(names),)),
+    ]
+
+
+def measure(users, repeats, seed):
+    sqltrace.tracer.reset()
+    timings = {}
+    for name, fn, make_args in helpers(users, repeats, random.Random(seed)):
+        samples = []
+        for _ in range(repeats):
+            args = make_args()
+            start = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - start)
+        timings[name] = percentile(samples, 50) * 1000
+    queries, _ = sqltrace.tracer.snapshot()
+    plans = {sql: plan for sql, _, _, _, _, plan in queries
+             if plan and ("leaderboard" in sql or "users" in sql) and not sql.startswith("INSERT")}
+    return timings, plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    sqltrace.TRACE_ENABLED = True  # the plans below come from the tracer
+    with temp_database("index_report.db"):
+        _, rows = populate(EventProfile(users=args.users, rounds=20, event_hours=3.5), args.seed)
+        print(f"{args.users} users, {rows} leaderboard rows\n")
+
+        conn = database.get_db_connection()
+        for index in INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+        conn.commit()
+        before, before_plans = measure(args.users, args.repeats, args.seed)
+
+        start = time.perf_counter()
+        conn.executescript(database.MIGRATIONS[MIGRATION - 1])
+        build_seconds = time.perf_counter() - start
+        conn.close()
+        after, after_plans = measure(args.users, args.repeats, args.seed + 1)
+
+    print(f"index build (migration {MIGRATION}): {build_seconds:.1f}s\n")
+    print(f"{'helper':<26}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<26}{before[name]:>12.1f}{after[name]:>12.1f}{speedup:>9.1f}x")
+
+    for title, plans in (("before", before_plans), ("after", after_plans)):
+        print(f"\nplans {title}:")
+        for sql, plan in plans.items():
+            print(f"  {sql[:100]}")
+            for detail in plan:
+                print(f"      {detail}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "leaderboard_rows": rows, "build_seconds": build_seconds,
+                       "before_ms": before, "after_ms": after,
+                       "before_plans": before_plans, "after_plans": after_plans}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Headless load test: N simulated players against a local database.
+
+    python -m benchmarks.loadtest --players 200 --seconds 30
+
+No browser or network is involved. Each simulated player joins through the
+game engine the app uses (engine.GameEngine), then keeps doing what a player
+page rerun does (fetch the current question and the standings, format the
+table) on the app's refresh cadence, and submits answers on its own schedule,
+some of them wrong. Submissions go through the engine's rate limiter, answer
+check and compare-and-set progress write. --refresh 0 drives the engine as
+fast as it will go.
+
+The report covers rerun and submit latency, waits for the database write lock,
+and throughput. With --read-replica the shared reads go to an in-memory
+replica of the database (replica.py) while writes stay on disk. With
+--adaptive the players follow the app's load controller (load_shedding.py)
+instead of --refresh: its cadence and its top-K table.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+import database
+import sqltrace
+from benchmarks.common import summarize, temp_database
+from benchmarks.eventgen import EventProfile, populate
+from benchmarks.multi_worker import render
+from engine import CORRECT, RATE_LIMITED, GameEngine
+from load_shedding import LoadController
+from replica import ReadReplica
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reruns = []
+        self.submits = []
+        self.joins = []
+        self.correct = 0
+        self.wrong = 0
+        self.rate_limited = 0
+        self.errors = []
+
+    def add(self, name, seconds):
+        with self.lock:
+            getattr(self, name).append(seconds)
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+def player(index, args, game, controller, metrics, start_at, stop_at):
+    rng = random.Random(args.seed * 100003 + index)
+    username = f"loadtest{index}"
+    # Stagger arrivals over the ramp-up window
+    time.sleep(max(0.0, start_at + rng.uniform(0, args.ramp) - time.perf_counter()))
+
+    try:
+        start = time.perf_counter()
+        level, _ = game.join(username)
+        metrics.add("joins", time.perf_counter() - start)
+
+        next_submit = time.perf_counter() + rng.expovariate(1 / args.submit_interval)
+        while time.perf_counter() < stop_at:
+            load = controller.current() if controller is not None else None
+            start = time.perf_counter()
+            question = game.current_question(level)
+            render(game.standings(), load.top if load is not None else None)
+            metrics.add("reruns", time.perf_counter() - start)
+            if controller is not None:
+                controller.record_rerun(time.perf_counter() - start)
+
+            if time.perf_counter() >= next_submit and question is not None:
+                answer = "wrong" if rng.random() < args.wrong_ratio else question.answer
+                start = time.perf_counter()
+                result = game.submit(username, level, answer, f"10.0.{index % 250}.1")
+                metrics.add("submits", time.perf_counter() - start)
+                level = result.level
+                if result.status == RATE_LIMITED:
+                    metrics.count("rate_limited")
+                elif result.status == CORRECT:
+                    metrics.count("correct")
+                else:
+                    metrics.count("wrong")
+                next_submit = time.perf_counter() + rng.expovariate(1 / args.submit_interval)
+
+            time.sleep(load.player_refresh if load is not None else args.refresh)
+    except Exception as e:
+        with metrics.lock:
+            metrics.errors.append(f"{type(e).__name__}: {e}")
+
+
+def run(args):
+    game = GameEngine()
+    metrics = Metrics()
+    database.lock_waits.reset()
+    controller = LoadController(enabled=True) if args.adaptive else None
+
+    start_at = time.perf_counter()
+    stop_at = start_at + args.seconds
+    threads = [threading.Thread(target=player,
+                                args=(i, args, game, controller, metrics, start_at, stop_at))
+               for i in range(args.players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    game.close()
+    elapsed = time.perf_counter() - start_at
+
+    return {
+        "players": args.players,
+        "seconds": elapsed,
+        "joins": summarize(metrics.joins),
+        "reruns": summarize(metrics.reruns),
+        "submits": summarize(metrics.submits),
+        "lock_waits": summarize(database.lock_waits.recent()),
+        "throughput": {
+            "reruns_per_s": len(metrics.reruns) / elapsed,
+            "submits_per_s": len(metrics.submits) / elapsed,
+            "correct_per_s": metrics.correct / elapsed,
+        },
+        "correct": metrics.correct,
+        "wrong": metrics.wrong,
+        "rate_limited": metrics.rate_limited,
+        "errors": len(metrics.errors),
+        "first_error": metrics.errors[0] if metrics.errors else None,
+        "replica": replica_stats(),
+        "load_levels": [[round(at - time.time() + elapsed, 1), name]
+                        for at, name, _ in reversed(controller.changes)] if controller else None,
+    }
+
+
+def replica_stats():
+    replica = database.replica
+    if replica is None:
+        return None
+    return {"refreshes": replica.refreshes, "last_copy_ms": replica.last_copy_seconds * 1000,
+            "disk_reads": replica.disk_reads}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which players join")
+    parser.add_argument("--refresh", type=float, default=1.0,
+                        help="seconds between reruns (the player page refreshes every second)")
+    parser.add_argument("--submit-interval", type=float, default=5.0,
+                        help="mean seconds between a player's submissions")
+    parser.add_argument("--wrong-ratio", type=float, default=0.5)
+    parser.add_argument("--background-players", type=int, default=500,
+                        help="players already on the leaderboard before the test starts")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--read-replica", action="store_true",
+                        help="serve the shared reads from an in-memory replica")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="refresh on the load controller's cadence instead of --refresh")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    with temp_database():
+        populate(EventProfile(users=args.background_players, rounds=args.rounds), args.seed)
+        if args.read_replica:
+            database.replica = ReadReplica(database.get_db_connection, sqltrace.connect)
+            database.replica.refresh()
+        report = run(args)
+        if database.replica is not None:
+            database.replica.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['players']} players for {report['seconds']:.1f}s")
+    for name in ("joins", "reruns", "submits", "lock_waits"):
+        stats = report[name]
+        print(f"  {name:<10} n={stats['count']:<7} p50={stats['p50_ms']:.1f}ms "
+              f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+    throughput = report["throughput"]
+    print(f"  throughput: {throughput['reruns_per_s']:.1f} reruns/s, "
+          f"{throughput['submits_per_s']:.1f} submits/s, {throughput['correct_per_s']:.1f} correct/s")
+    print(f"  correct={report['correct']} wrong={report['wrong']} "
+          f"rate_limited={report['rate_limited']} errors={report['errors']}")
+    if report["first_error"]:
+        print(f"  first error: {report['first_error']}")
+    if report["load_levels"] is not None:
+        steps = ", ".join(f"{name} at {at:.0f}s" for at, name in report["load_levels"]) or "none"
+        print(f"  load level changes: {steps}")
+    if report["replica"]:
+        replica = report["replica"]
+        print(f"  replica: {replica['refreshes']} refreshes, last copy {replica['last_copy_ms']:.1f}ms, "
+              f"{replica['disk_reads']} reads fell back to disk")
+
+
+if __name__ == "__main__":
+    main()
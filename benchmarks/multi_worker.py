@@ -0,0 +1,162 @@
+"""Local multi-worker benchmark: throughput of 1, 2, 4... worker processes on one database.
+
+    python -m benchmarks.multi_worker --workers 1 2 4 --sessions 8 --seconds 5
+
+Each worker process runs several simulated sessions on one engine.GameEngine,
+as a Streamlit worker does. A session "rerun" reads the leaderboard and
+questions through the engine's process-local caches and formats the
+leaderboard table the way the player page does; a fraction of reruns also
+submit a correct answer. Each worker count is run twice: with every process
+querying and ranking the leaderboard itself, and with the processes mapping a
+snapshot published by the parent (as run_workers.py does). The run finishes
+with a check of how long a write in one process takes to show up in another
+process's cache.
+"""
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+
+import database
+import snapshot
+from engine import GameEngine
+from benchmarks.common import summarize, temp_database
+from benchmarks.eventgen import EventProfile, populate
+
+QUESTION_COUNT = 20
+
+
+def seed(players):
+    populate(EventProfile(users=players, rounds=QUESTION_COUNT), seed=0)
+
+
+# The per-rerun formatting the player page applies to the leaderboard
+def render(standings, top=None):
+    if not len(standings):
+        return 0
+    df = standings.frame().head(top)
+    view = df[["Rank", "Player", "Round"]]
+    return len(view)
+
+
+def worker(db_path, snapshot_path, sessions, seconds, write_ratio, players, worker_id, results):
+    database.DATABASE_FILE = db_path
+    if snapshot_path:
+        database.snapshot_reader = snapshot.SnapshotReader(snapshot_path)
+    game = GameEngine()
+    stop_at = time.perf_counter() + seconds
+    latencies = []
+    lock = threading.Lock()
+
+    def session(session_id):
+        rng = random.Random(worker_id * 1000 + session_id)
+        local = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            game.question_count()
+            render(game.standings())
+            if rng.random() < write_ratio:
+                username = f"player{rng.randrange(players):06d}"
+                level = game.level_of(username)
+                question = game.current_question(level) if level is not None else None
+                if question is not None:
+                    game.submit(username, level, question.answer)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(latencies)
+
+
+def run(db_path, snapshot_path, workers, sessions, seconds, write_ratio, players):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker,
+                         args=(db_path, snapshot_path, sessions, seconds, write_ratio, players, i, results))
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    latencies = []
+    for _ in procs:
+        latencies.extend(results.get())
+    for proc in procs:
+        proc.join()
+    summary = summarize(latencies)
+    summary["reruns_per_s"] = len(latencies) / seconds
+    return summary
+
+
+def watch_for_row(db_path, username, ready, seen):
+    database.DATABASE_FILE = db_path
+    database.cached_standings()
+    ready.set()
+    while True:
+        if database.cached_standings().index_of(username) is not None:
+            seen.value = time.time()
+            return
+        time.sleep(0.005)
+
+
+# Time from a commit in this process to the change being visible in another
+def invalidation_lag(db_path):
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    seen = ctx.Value("d", 0.0)
+    proc = ctx.Process(target=watch_for_row, args=(db_path, "lag_probe", ready, seen))
+    proc.start()
+    ready.wait()
+    time.sleep(0.2)
+    database.bootstrap_player("lag_probe")
+    written = time.time()
+    database.update_user_progress("lag_probe", 0)
+    proc.join()
+    return seen.value - written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=8, help="sessions per worker")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--players", type=int, default=500)
+    args = parser.parse_args()
+
+    with temp_database() as db_path:
+        seed(args.players)
+        snapshot_path = db_path + ".snapshot"
+        publisher = snapshot.SnapshotPublisher(snapshot_path, database.load_standings,
+                                               lambda: database.get_data_versions()[0])
+        publisher.publish_if_changed()
+        start = time.perf_counter()
+        database.load_standings()
+        query_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        snapshot.read_snapshot(snapshot_path)
+        map_ms = (time.perf_counter() - start) * 1000
+        print(f"leaderboard for {args.players} players: query and rank {query_ms:.1f} ms, "
+              f"map snapshot {map_ms:.1f} ms")
+
+        stop = threading.Event()
+        threading.Thread(target=publisher.run, args=(stop,), daemon=True).start()
+        for workers in args.workers:
+            for mode, path in (("query", None), ("snapshot", snapshot_path)):
+                result = run(db_path, path, workers, args.sessions, args.seconds,
+                             args.write_ratio, args.players)
+                print(f"{workers} worker(s) x {args.sessions} sessions, {mode:<8}: "
+                      f"{result['reruns_per_s']:.0f} reruns/s, "
+                      f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+        stop.set()
+        print(f"snapshots published: {publisher.published}")
+        print(f"cross-process invalidation lag: {invalidation_lag(db_path) * 1000:.0f} ms "
+              f"(check interval {database.VERSION_CHECK_INTERVAL_SEC * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Shared reads against the database file versus the in-memory read replica.
+
+    python -m benchmarks.replica_bench --users 20000 --seconds 10
+
+Reader threads call the shared read helpers (questions, standings, player
+list) back to back, uncached, while writer threads keep advancing players.
+Each mode runs against the same seeded database. The replica run also samples
+how far behind the disk the replica was when each read started.
+"""
+import argparse
+import random
+import threading
+import time
+
+import database
+import sqltrace
+from benchmarks.common import summarize, temp_database
+from benchmarks.eventgen import EventProfile, populate
+from replica import ReadReplica
+
+READS = (database.load_questions, database.load_standings, database.load_players)
+
+
+def run(args, use_replica):
+    if use_replica:
+        database.replica = ReadReplica(database.get_db_connection, sqltrace.connect,
+                                       max_staleness=args.max_staleness)
+        database.replica.refresh()
+        database.replica.start()
+    stop_at = time.perf_counter() + args.seconds
+    lock = threading.Lock()
+    reads, writes, staleness = [], [], []
+
+    def reader():
+        local, lag = [], []
+        i = 0
+        while time.perf_counter() < stop_at:
+            if database.replica is not None:
+                lag.append(database.replica.staleness() or 0.0)
+            start = time.perf_counter()
+            READS[i % len(READS)]()
+            local.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            reads.extend(local)
+            staleness.extend(lag)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        local = []
+        while time.perf_counter() < stop_at:
+            username = f"player{rng.randrange(args.users):06d}"
+            level = database.get_player_level(username)
+            start = time.perf_counter()
+            database.update_user_progress(username, level)
+            local.append(time.perf_counter() - start)
+        with lock:
+            writes.extend(local)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = {"reads": summarize(reads), "writes": summarize(writes)}
+    if database.replica is not None:
+        result["staleness"] = summarize(staleness)
+        result["refreshes"] = database.replica.refreshes
+        result["last_copy_ms"] = database.replica.last_copy_seconds * 1000
+        result["disk_reads"] = database.replica.disk_reads
+        database.replica.stop()
+        database.replica = None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--max-staleness", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with temp_database("replica_bench.db"):
+        populate(EventProfile(users=args.users, rounds=20), args.seed)
+        for mode in ("disk", "replica"):
+            result = run(args, mode == "replica")
+            print(f"{mode}:")
+            for name in ("reads", "writes", "staleness"):
+                if name in result:
+                    stats = result[name]
+                    print(f"  {name:<10} n={stats['count']:<7} p50={stats['p50_ms']:.1f}ms "
+                          f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+            if "refreshes" in result:
+                print(f"  {result['refreshes']} refreshes, last copy {result['last_copy_ms']:.1f}ms, "
+                      f"{result['disk_reads']} reads fell back to disk")
+
+
+if __name__ == "__main__":
+    main()
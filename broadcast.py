@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import json
+import queue
+import threading
+
+import database
+import deltas
+
+# Push side of the leaderboard. An asyncio loop on its own thread watches for
+# new leaderboard versions and sends every subscriber one delta per change
+# (deltas.py), so screens wait for news instead of polling for it.
+#
+# A change is noticed three ways: a solve in this process (database calls
+# wake() through progress_listeners), a snapshot published by this process
+# (run_workers.py hands it over with offer()), or, as a fallback for writes
+# from other processes, a version check every WATCH_INTERVAL_SEC.
+WATCH_INTERVAL_SEC = 0.5
+COALESCE_SEC = 0.05  # a burst of solves becomes one message
+SUBSCRIBER_QUEUE = 32
+KEEPALIVE_SEC = 15
+
+
+# Server-sent-events framing; `data` is JSON-encoded
+def sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"{head}event: {event}\ndata: {body}\n\n".encode("utf-8")
+
+
+# One subscriber's mailbox. Filled on the hub's loop, drained by whatever
+# thread serves the subscriber. A subscriber that falls SUBSCRIBER_QUEUE
+# messages behind is sent a single reset instead, telling it to refetch.
+# Messages are "progress" with a delta payload, or "reset".
+class Subscription:
+    def __init__(self, hub, maxsize=SUBSCRIBER_QUEUE):
+        self._hub = hub
+        self._queue = queue.Queue(maxsize)
+
+    def offer(self, message, reset):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put_nowait(reset)
+            self._hub.overflows += 1
+
+    # Next message, or None after `timeout` seconds without one
+    def get(self, timeout=KEEPALIVE_SEC):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    def __init__(self, source=functools.partial(database.versioned_standings, fresh=True),
+                 log=deltas.history):
+        self._source = source
+        self._log = log
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._loop = None
+        self._wake = None
+        self._offered = None  # (version, standings) handed over by offer()
+        self._current = (None, None)
+        self.version = None
+        self.messages = 0
+        self.overflows = 0
+
+    def start(self):
+        ready = threading.Event()
+        threading.Thread(target=asyncio.run, args=(self._main(ready),), name="broadcast", daemon=True).start()
+        ready.wait()
+        return self
+
+    # Thread-safe nudge to check for a new version now. Matches the
+    # progress_listeners signature, so it can be registered there directly.
+    def wake(self, *_):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # Thread-safe: a freshly built ranking, so the hub need not load it
+    def offer(self, version, standings):
+        self._offered = (version, standings)
+        self.wake()
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    # First message for a new subscriber. One reconnecting with the id of the
+    # last message it saw is caught up with a delta, or a reset if too far behind.
+    def hello(self, last_event_id=None):
+        version, standings = self._current
+        try:
+            since = int(last_event_id)
+        except (TypeError, ValueError):
+            since = None
+        if since is None or version is None or since == version:
+            return sse("hello", {"version": version}, version)
+        delta = self._log.since(since, version, standings)
+        if delta is None:
+            return sse("reset", {"version": version, "players": len(standings)}, version)
+        return sse("progress", delta.payload(), version)
+
+    async def _main(self, ready):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        ready.set()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), WATCH_INTERVAL_SEC)
+                await asyncio.sleep(COALESCE_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                pending = self._loop.run_in_executor(None, self._diff)
+            except RuntimeError:
+                return  # the interpreter is shutting down
+            try:
+                message = await pending
+            except Exception as e:
+                print(f"Error building leaderboard update: {e}")
+                continue
+            if message is not None:
+                self._fan_out(*message)
+
+    # Runs on an executor thread, one call at a time. Returns (message, reset)
+    # for a new version, or None when nothing changed.
+    def _diff(self):
+        offered, self._offered = self._offered, None
+        version, standings = offered if offered is not None else self._source()
+        if version == self.version:
+            return None
+        previous = self.version
+        self._current = (version, standings)
+        self.version = version
+
+        reset = sse("reset", {"version": version, "players": len(standings)}, version)
+        if previous is None:
+            self._log.record(version, standings)
+            return reset, reset
+        delta = self._log.since(previous, version, standings)
+        if delta is None:
+            return reset, reset  # too much changed: subscribers refetch
+        return sse("progress", delta.payload(), version), reset
+
+    def _fan_out(self, message, reset):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(message, reset)
+        self.messages += 1
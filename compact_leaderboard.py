@@ -0,0 +1,33 @@
+"""Fold the leaderboard down to one row per player, archiving the rest.
+
+    python compact_leaderboard.py [--db cryptic_hunt2025.db]
+
+Every earlier row moves to leaderboard_archive, a few hundred players per
+transaction, so it is safe to run while the event is live. Standings are
+unchanged. Rank-over-time and other history queries read both tables through
+the leaderboard_history view.
+"""
+import argparse
+import time
+
+import database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DATABASE_FILE)
+    parser.add_argument("--batch-users", type=int, default=database.COMPACTION_BATCH_USERS,
+                        help="players moved per transaction")
+    args = parser.parse_args()
+
+    database.DATABASE_FILE = args.db
+    database.initialize_db()
+    start = time.perf_counter()
+    moved = database.compact_leaderboard(args.batch_users)
+    waits = database.lock_waits.recent()
+    print(f"moved {moved} rows to leaderboard_archive in {time.perf_counter() - start:.1f}s "
+          f"({len(waits)} transactions, longest wait for the write lock {max(waits, default=0) * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Convert an existing database file to integer epoch-millisecond timestamps.
+
+    python convert_timestamps.py cryptic_hunt.db [--dry-run]
+
+Applies the pending schema migrations to the file, including the one that
+rewrites the leaderboard, last_update and rate_limit_rejections timestamps
+from text to UTC epoch milliseconds. The original is first copied next to it
+as <file>.bak, using the SQLite backup API so an un-checkpointed WAL is
+included.
+
+Text written by this app is local time and is converted using the time zone
+of the machine running this script, so run it with the zone the event ran in
+(set TZ if needed). Databases whose leaderboard defaulted to CURRENT_TIMESTAMP
+hold UTC text; they are recognised from their schema.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import database
+
+
+def describe(path):
+    conn = sqlite3.connect(path)
+    try:
+        schema = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard'").fetchone()
+        return {
+            "user_version": conn.execute("PRAGMA user_version").fetchone()[0],
+            "source_zone": "utc" if schema and "CURRENT_TIMESTAMP" in schema[0] else "localtime",
+            "users": conn.execute("SELECT COUNT(*) FROM users").fetchone()[0],
+            "leaderboard": conn.execute("SELECT COUNT(*) FROM leaderboard").fetchone()[0],
+            "range": conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM leaderboard").fetchone(),
+            "text_timestamps": conn.execute(
+                "SELECT COUNT(*) FROM leaderboard WHERE typeof(timestamp) != 'integer'").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def backup(path, target):
+    source = sqlite3.connect(path)
+    dest = sqlite3.connect(target)
+    try:
+        source.backup(dest)
+    finally:
+        dest.close()
+        source.close()
+
+
+def convert(path):
+    database.DATABASE_FILE = path
+    database.initialize_db()
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="database file to convert in place")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="convert a temporary copy and report, leaving the file untouched")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        sys.exit(f"Error: {args.path} does not exist")
+    before = describe(args.path)
+    print(f"{args.path}: schema version {before['user_version']}, {before['users']} users, "
+          f"{before['leaderboard']} leaderboard rows, text timestamps read as {before['source_zone']}")
+    print(f"  before: {before['range'][0]} .. {before['range'][1]}")
+
+    workdir = None
+    target = args.path
+    if args.dry_run:
+        workdir = tempfile.mkdtemp(prefix="convert_timestamps_")
+        target = os.path.join(workdir, os.path.basename(args.path))
+        backup(args.path, target)
+    else:
+        backup_path = args.path + ".bak"
+        if os.path.exists(backup_path):
+            sys.exit(f"Error: {backup_path} already exists; move it away first")
+        backup(args.path, backup_path)
+        print(f"  backup: {backup_path}")
+
+    try:
+        size_before = os.path.getsize(target)
+        convert(target)
+        after = describe(target)
+        size_after = os.path.getsize(target)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    first, last = after["range"]
+    if first is not None:
+        print(f"  after:  {database.format_epoch_ms(first, '%Y-%m-%d %H:%M:%S')} .. "
+              f"{database.format_epoch_ms(last, '%Y-%m-%d %H:%M:%S')} local "
+              f"({first} .. {last} ms)")
+    print(f"  schema version {after['user_version']}, {after['leaderboard']} leaderboard rows "
+          f"(duplicates removed: {before['leaderboard'] - after['leaderboard']}), "
+          f"file {size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB")
+    if after["text_timestamps"]:
+        sys.exit(f"Error: {after['text_timestamps']} leaderboard timestamps were not converted")
+    if args.dry_run:
+        print("  dry run: nothing was changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,822 @@
+import sqlite3
+import pandas as pd
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import sqltrace
+import write_retry
+from ranking import Standings
+from replica import REPLICA_ENABLED, ReadReplica
+from snapshot import SNAPSHOT_FILE, SnapshotReader
+
+# Constants. Every app worker must point at the same database file.
+DATABASE_FILE = os.environ.get("CRYPTIC_HUNT_DB", "cryptic_hunt2025.db")
+QUESTIONS_CSV = "questions.csv"
+
+# Database connection. WAL (enabled in initialize_db) lets readers run alongside
+# the single writer, so commits only need a full fsync at checkpoints. Statements
+# are timed and their query plans captured by sqltrace.
+def get_db_connection():
+    conn = sqltrace.connect(DATABASE_FILE, check_same_thread=False)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+# Connection for the player writes. Each attempt waits only briefly for the
+# lock; write_retry backs off and retries instead of one long wait.
+def get_write_connection():
+    conn = get_db_connection()
+    conn.execute(f"PRAGMA busy_timeout = {write_retry.BUSY_TIMEOUT_MS}")
+    return conn
+
+# Optional in-memory copy of the database for the shared reads (see replica.py)
+replica = ReadReplica(get_db_connection, sqltrace.connect) if REPLICA_ENABLED else None
+
+# Connection for reads that tolerate bounded staleness: the replica when it is
+# enabled and fresh enough, otherwise the database file. Never write through it.
+def get_read_connection():
+    if replica is not None:
+        replica.start()
+        conn = replica.connect()
+        if conn is not None:
+            return conn
+    return get_db_connection()
+
+# Recent waits for the database write lock, in seconds
+class LockWaitStats:
+    def __init__(self, maxlen=10000):
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def recent(self):
+        with self._lock:
+            return list(self.samples)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.count = 0
+            self.total = 0.0
+
+lock_waits = LockWaitStats()
+
+# Take the write lock up front, timing how long other writers made us wait.
+# BEGIN IMMEDIATE also avoids the deferred read-to-write upgrade that fails
+# with "database is locked" without waiting.
+def begin_write(conn):
+    start = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    lock_waits.record(time.perf_counter() - start)
+
+# Initialize SQLite database and create tables
+def initialize_db():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Free pages are returned to the OS by maintenance.py's incremental vacuum.
+    # This only applies to a new file; existing ones switch at their next VACUUM.
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # Write-ahead logging is persistent, so this only does work on the first run
+    cursor.execute("PRAGMA journal_mode = WAL")
+
+    # A new file gets the current schema in one go. Anything else is a file the
+    # app created before the migrations (or a partial one): it gets the tables
+    # it may lack in their original form, and the migrations bring it forward.
+    if not cursor.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]:
+        conn.executescript(f"BEGIN IMMEDIATE; {SCHEMA} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;")
+        apply_migrations(conn)
+        conn.close()
+        return
+
+    # Create users table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            level INTEGER DEFAULT 0
+        )
+    """)
+
+    # Create questions table with level starting from 0
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            level INTEGER UNIQUE NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            hints TEXT,
+            image_url TEXT  -- New column for image URL
+        )
+    """)
+
+    # Create leaderboard table with auto-updating timestamp
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            timestamp DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        )
+    """)
+
+    # Create a table to track last update
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS last_update (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            timestamp DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        )
+    """)
+
+    # Insert initial last_update record if not exists
+    cursor.execute("""
+        INSERT OR IGNORE INTO last_update (id) VALUES (1)
+    """)
+
+    # Create a table for rate-limited answer attempts (written in batches)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limit_rejections (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            last_rejected DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            PRIMARY KEY (kind, key)
+        )
+    """)
+
+    # Create trigger to update last_update timestamp
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS update_leaderboard_timestamp
+        AFTER INSERT ON leaderboard
+        BEGIN
+            UPDATE last_update 
+            SET timestamp = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE id = 1;
+        END
+    """)
+
+    conn.commit()
+    apply_migrations(conn)
+    conn.close()
+
+# Current time as integer milliseconds since the Unix epoch (UTC), for SQL defaults and triggers
+EPOCH_MS_NOW = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+
+# The schema as of migration SCHEMA_VERSION, for new files; later migrations
+# still run on top of it. When a later migration is folded in here, raise
+# SCHEMA_VERSION to match.
+SCHEMA_VERSION = 4
+SCHEMA = f"""
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        level INTEGER DEFAULT 0
+    );
+    CREATE INDEX idx_users_level ON users (level DESC, username);
+
+    CREATE TABLE questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        level INTEGER UNIQUE NOT NULL,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        hints TEXT,
+        image_url TEXT
+    );
+
+    CREATE TABLE leaderboard (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL DEFAULT ({EPOCH_MS_NOW})
+    );
+    CREATE UNIQUE INDEX idx_leaderboard_username_level ON leaderboard (username, level);
+    CREATE INDEX idx_leaderboard_user_level_ts ON leaderboard (username, level DESC, timestamp);
+    CREATE INDEX idx_leaderboard_level_ts ON leaderboard (level DESC, timestamp);
+
+    CREATE TABLE last_update (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        timestamp INTEGER NOT NULL DEFAULT ({EPOCH_MS_NOW}),
+        version INTEGER NOT NULL DEFAULT 0,
+        questions_version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO last_update (id) VALUES (1);
+
+    CREATE TABLE rate_limit_rejections (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        rejected INTEGER NOT NULL DEFAULT 0,
+        last_rejected INTEGER NOT NULL DEFAULT ({EPOCH_MS_NOW}),
+        PRIMARY KEY (kind, key)
+    );
+
+    CREATE TRIGGER update_leaderboard_timestamp
+    AFTER INSERT ON leaderboard
+    BEGIN
+        UPDATE last_update
+        SET timestamp = {EPOCH_MS_NOW},
+            version = version + 1
+        WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_insert AFTER INSERT ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_update AFTER UPDATE ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_delete AFTER DELETE ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+"""
+
+# Schema changes applied after the base tables exist. Each entry runs once and
+# PRAGMA user_version records how many have been applied to a database file.
+MIGRATIONS = [
+    # 1: one leaderboard row per (username, level), so repeated progress writes are no-ops
+    """
+    DELETE FROM leaderboard
+    WHERE id NOT IN (SELECT MIN(id) FROM leaderboard GROUP BY username, level);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_leaderboard_username_level
+        ON leaderboard (username, level);
+    """,
+    # 2: version counters that app workers poll to invalidate their local caches
+    """
+    ALTER TABLE last_update ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE last_update ADD COLUMN questions_version INTEGER NOT NULL DEFAULT 0;
+    DROP TRIGGER IF EXISTS update_leaderboard_timestamp;
+    CREATE TRIGGER update_leaderboard_timestamp
+    AFTER INSERT ON leaderboard
+    BEGIN
+        UPDATE last_update
+        SET timestamp = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'),
+            version = version + 1
+        WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_insert AFTER INSERT ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_update AFTER UPDATE ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_delete AFTER DELETE ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    """,
+    # 3: covering indexes for the ranking queries and the admin player list
+    """
+    CREATE INDEX IF NOT EXISTS idx_leaderboard_user_level_ts
+        ON leaderboard (username, level DESC, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_leaderboard_level_ts
+        ON leaderboard (level DESC, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_users_level
+        ON users (level DESC, username);
+    """,
+    # 4: timestamps become integer epoch milliseconds in UTC. Text written by this
+    # app is local time; databases whose leaderboard defaulted to CURRENT_TIMESTAMP
+    # hold UTC text. Tables are rebuilt, so triggers that name them go first.
+    f"""
+    DROP TRIGGER IF EXISTS bump_questions_version_on_insert;
+    DROP TRIGGER IF EXISTS bump_questions_version_on_update;
+    DROP TRIGGER IF EXISTS bump_questions_version_on_delete;
+
+    CREATE TEMP TABLE timestamp_source AS
+    SELECT sql LIKE '%CURRENT_TIMESTAMP%' AS utc FROM sqlite_master
+    WHERE type = 'table' AND name = 'leaderboard';
+
+    CREATE TABLE leaderboard_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL DEFAULT ({EPOCH_MS_NOW})
+    );
+    INSERT INTO leaderboard_new (id, username, level, timestamp)
+    SELECT id, username, level, COALESCE(CASE
+        WHEN typeof(timestamp) IN ('integer', 'real') THEN CAST(timestamp AS INTEGER)
+        WHEN (SELECT utc FROM temp.timestamp_source)
+            THEN CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER)
+        ELSE CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)
+    END, {EPOCH_MS_NOW})
+    FROM leaderboard;
+    DELETE FROM sqlite_sequence WHERE name = 'leaderboard_new';
+    UPDATE sqlite_sequence SET name = 'leaderboard_new' WHERE name = 'leaderboard';
+    DROP TABLE leaderboard;
+    ALTER TABLE leaderboard_new RENAME TO leaderboard;
+    DROP TABLE temp.timestamp_source;
+
+    CREATE TABLE last_update_new (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        timestamp INTEGER NOT NULL DEFAULT ({EPOCH_MS_NOW}),
+        version INTEGER NOT NULL DEFAULT 0,
+        questions_version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT INTO last_update_new (id, timestamp, version, questions_version)
+    SELECT id, COALESCE(CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER),
+                        {EPOCH_MS_NOW}),
+           version, questions_version
+    FROM last_update;
+    DROP TABLE last_update;
+    ALTER TABLE last_update_new RENAME TO last_update;
+
+    CREATE TABLE rate_limit_rejections_new (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        rejected INTEGER NOT NULL DEFAULT 0,
+        last_rejected INTEGER NOT NULL DEFAULT ({EPOCH_MS_NOW}),
+        PRIMARY KEY (kind, key)
+    );
+    INSERT INTO rate_limit_rejections_new (kind, key, rejected, last_rejected)
+    SELECT kind, key, rejected,
+           COALESCE(CAST(ROUND((julianday(last_rejected, 'utc') - 2440587.5) * 86400000) AS INTEGER),
+                    {EPOCH_MS_NOW})
+    FROM rate_limit_rejections;
+    DROP TABLE rate_limit_rejections;
+    ALTER TABLE rate_limit_rejections_new RENAME TO rate_limit_rejections;
+
+    CREATE UNIQUE INDEX idx_leaderboard_username_level ON leaderboard (username, level);
+    CREATE INDEX idx_leaderboard_user_level_ts ON leaderboard (username, level DESC, timestamp);
+    CREATE INDEX idx_leaderboard_level_ts ON leaderboard (level DESC, timestamp);
+
+    CREATE TRIGGER update_leaderboard_timestamp
+    AFTER INSERT ON leaderboard
+    BEGIN
+        UPDATE last_update
+        SET timestamp = {EPOCH_MS_NOW},
+            version = version + 1
+        WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_insert AFTER INSERT ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_update AFTER UPDATE ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER bump_questions_version_on_delete AFTER DELETE ON questions
+    BEGIN
+        UPDATE last_update SET questions_version = questions_version + 1 WHERE id = 1;
+    END;
+    """,
+    # 5: archive for leaderboard rows folded away by compact_leaderboard(), and a
+    # view over both tables for queries that need the full history
+    """
+    CREATE TABLE leaderboard_archive (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        timestamp INTEGER NOT NULL
+    );
+    CREATE UNIQUE INDEX idx_leaderboard_archive_username_level
+        ON leaderboard_archive (username, level);
+    CREATE INDEX idx_leaderboard_archive_level_ts
+        ON leaderboard_archive (level, timestamp);
+    CREATE VIEW leaderboard_history AS
+        SELECT id, username, level, timestamp FROM leaderboard
+        UNION ALL
+        SELECT id, username, level, timestamp FROM leaderboard_archive;
+    """,
+]
+
+# Secondary indexes the migrations above are expected to have created
+MANAGED_INDEXES = (
+    "idx_leaderboard_username_level",
+    "idx_leaderboard_user_level_ts",
+    "idx_leaderboard_level_ts",
+    "idx_users_level",
+    "idx_leaderboard_archive_username_level",
+    "idx_leaderboard_archive_level_ts",
+)
+
+# The statements run on every rerun or every answer; benchmarks/check_indexes.py
+# fails if any of them stops using an index.
+STANDINGS_SQL = """
+    SELECT username, MAX(level), timestamp
+    FROM leaderboard
+    GROUP BY username
+"""
+PLAYER_LEVEL_SQL = "SELECT level FROM users WHERE username = ?"
+ADVANCE_PLAYER_SQL = """
+    UPDATE users SET level = level + 1
+    WHERE username = ? AND level = ?
+"""
+HOT_QUERIES = (
+    ("standings", STANDINGS_SQL, ()),
+    ("player level", PLAYER_LEVEL_SQL, ("player",)),
+    ("advance player", ADVANCE_PLAYER_SQL, ("player", 0)),
+)
+
+def missing_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [name for name in MANAGED_INDEXES if name not in existing]
+
+def apply_migrations(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.executescript(f"BEGIN IMMEDIATE; {script} PRAGMA user_version = {number}; COMMIT;")
+
+# Load questions from CSV and insert into the database
+def load_questions_from_csv():
+    df = pd.read_csv(QUESTIONS_CSV)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    for _, row in df.iterrows():
+        level = row["Round"]
+        question = row["Question"]
+        answer = row["Answer"]
+        hints = json.dumps([row[f"Hint{i+1}"] for i in range(3) if f"Hint{i+1}" in row])
+
+        cursor.execute("""
+            INSERT OR IGNORE INTO questions (level, question, answer, hints)
+            VALUES (?, ?, ?, ?)
+        """, (level, question, answer, hints))
+
+    conn.commit()
+    conn.close()
+
+# Load questions from the database
+def load_questions():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT level, question, answer, hints, image_url FROM questions ORDER BY level")
+    questions = cursor.fetchall()
+    conn.close()
+    return questions
+
+# Load leaderboard from the database (only latest entry per user). MIN(timestamp)
+# is the player's first solve, which may have been archived by compaction.
+def load_leaderboard():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT username, MAX(level) as level, MIN(timestamp) as timestamp 
+        FROM leaderboard_history 
+        GROUP BY username 
+        ORDER BY level DESC, timestamp ASC
+    """)
+    leaderboard = cursor.fetchall()
+    conn.close()
+    return leaderboard
+
+# Get player's current rank, ordered the same way as the leaderboard views
+def get_player_rank(username):
+    entry = load_standings().rank_of(username)
+    return entry[0] if entry else None
+
+# Longest player name, in characters. Every way of creating a player checks it,
+# so names are never cut short further on (snapshot.py stores them in fixed
+# 128-byte records, which 32 characters of UTF-8 always fit).
+MAX_USERNAME_LENGTH = 32
+
+def check_username(username):
+    if len(username) > MAX_USERNAME_LENGTH:
+        raise ValueError(f"username must be at most {MAX_USERNAME_LENGTH} characters")
+
+# Create the player if they are new and return their level in a single statement.
+# The no-op DO UPDATE makes RETURNING yield the existing row when the name is taken.
+# While the database is saturated the insert is queued (see write_retry.py) and
+# the level is read instead: a new player starts on 0 either way.
+def bootstrap_player(username):
+    check_username(username)
+    return write_retry.guard.run(_bootstrap_player, (username,),
+                                 queued=lambda: get_player_level(username) or 0)
+
+def _bootstrap_player(username):
+    conn = get_write_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO users (username, password) VALUES (?, ?)
+            ON CONFLICT(username) DO UPDATE SET username = excluded.username
+            RETURNING level
+        """, (username, "dummy_password"))
+        level = cursor.fetchone()[0]
+        conn.commit()
+        return level
+    finally:
+        conn.close()
+
+# Look up a player's stored level, or None if they do not exist
+def get_player_level(username):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(PLAYER_LEVEL_SQL, (username,))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else None
+
+# Called as listener(username, level) after this process advances a player,
+# e.g. to push the change to leaderboard screens (see broadcast.py)
+progress_listeners = []
+
+# Advance a player by one level, but only from the level they are expected to be on.
+# Double submits and stale tabs become no-ops; returns the player's level afterwards.
+# The time reached is taken now, so a write that is retried or queued (see
+# write_retry.py) still ranks the player by when they answered.
+def update_user_progress(username, expected_level):
+    reached = int(time.time() * 1000)
+    return write_retry.guard.run(_update_user_progress, (username, expected_level, reached),
+                                 queued=lambda: expected_level + 1)
+
+def _update_user_progress(username, expected_level, reached):
+    conn = get_write_connection()
+    try:
+        cursor = conn.cursor()
+        begin_write(conn)
+        
+        # Compare-and-set on the user's level
+        cursor.execute(ADVANCE_PLAYER_SQL, (username, expected_level))
+        
+        advanced = cursor.rowcount == 1
+        if advanced:
+            # Add new leaderboard entry (trigger will update last_update timestamp)
+            cursor.execute("""
+                INSERT OR IGNORE INTO leaderboard (username, level, timestamp)
+                VALUES (?, ?, ?)
+            """, (username, expected_level + 1, reached))
+            conn.commit()
+            level = expected_level + 1
+        else:
+            # Someone else already moved this player on; report where they really are
+            conn.rollback()
+            cursor.execute(PLAYER_LEVEL_SQL, (username,))
+            result = cursor.fetchone()
+            level = result[0] if result else expected_level
+    finally:
+        conn.close()
+    if advanced:
+        for listener in progress_listeners:
+            listener(username, level)
+    return level
+
+# Check user credentials
+def authenticate_user(username, password):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
+    user = cursor.fetchone()
+    conn.close()
+    return user
+
+# Register a new user
+def register_user(username, password):
+    check_username(username)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        return False  # Username already exists
+    finally:
+        conn.close()
+
+# Add missing load_players function
+def load_players():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT username, level FROM users ORDER BY level DESC")
+    players = cursor.fetchall()
+    conn.close()
+    return players
+
+# Add missing delete_player function
+def delete_player(username):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        begin_write(conn)
+        cursor.execute("DELETE FROM users WHERE username = ?", (username,))
+        cursor.execute("DELETE FROM leaderboard WHERE username = ?", (username,))
+        cursor.execute("DELETE FROM leaderboard_archive WHERE username = ?", (username,))
+        bump_leaderboard_version(cursor)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error deleting player: {e}")
+        return False
+    finally:
+        conn.close()
+
+# Add missing reset_player_progress function
+def reset_player_progress(username):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        begin_write(conn)
+        cursor.execute("UPDATE users SET level = 0 WHERE username = ?", (username,))
+        cursor.execute("DELETE FROM leaderboard WHERE username = ?", (username,))
+        cursor.execute("DELETE FROM leaderboard_archive WHERE username = ?", (username,))
+        bump_leaderboard_version(cursor)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error resetting player progress: {e}")
+        return False
+    finally:
+        conn.close()
+
+# Users per compaction transaction; each batch holds the write lock briefly
+COMPACTION_BATCH_USERS = 500
+
+# Fold the leaderboard down to one summary row per player (their current round
+# and when they reached it, which is all the ranking reads) by moving every
+# earlier row to leaderboard_archive. Standings do not change, so the
+# leaderboard version is left alone. Returns the number of rows moved.
+def compact_leaderboard(batch_users=COMPACTION_BATCH_USERS):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    moved = 0
+    last_username = ""
+    try:
+        while True:
+            cursor.execute("""
+                SELECT MAX(username) FROM (
+                    SELECT DISTINCT username FROM leaderboard
+                    WHERE username > ? ORDER BY username LIMIT ?
+                )
+            """, (last_username, batch_users))
+            batch_end = cursor.fetchone()[0]
+            if batch_end is None:
+                break
+            begin_write(conn)
+            cursor.execute("""
+                CREATE TEMP TABLE compacted AS
+                SELECT id FROM leaderboard AS l
+                WHERE username > ? AND username <= ?
+                  AND level < (SELECT MAX(level) FROM leaderboard WHERE username = l.username)
+            """, (last_username, batch_end))
+            cursor.execute("""
+                INSERT OR IGNORE INTO leaderboard_archive (id, username, level, timestamp)
+                SELECT id, username, level, timestamp FROM leaderboard
+                WHERE id IN (SELECT id FROM temp.compacted)
+            """)
+            cursor.execute("DELETE FROM leaderboard WHERE id IN (SELECT id FROM temp.compacted)")
+            moved += cursor.rowcount
+            cursor.execute("DROP TABLE temp.compacted")
+            conn.commit()
+            last_username = batch_end
+        return moved
+    except Exception as e:
+        conn.rollback()
+        print(f"Error compacting leaderboard: {e}")
+        return moved
+    finally:
+        conn.close()
+
+# A player's rank at the moment they reached each round. Someone was ahead of
+# them then exactly when they had already reached that round, so each point is
+# a count over live and archived rows. The two tables are counted separately so
+# each count is a range scan of its (level, timestamp) index.
+def get_rank_history(username):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT h.level, h.timestamp,
+               1 + (SELECT COUNT(*) FROM leaderboard AS o
+                    WHERE o.level = h.level AND o.timestamp < h.timestamp)
+                 + (SELECT COUNT(*) FROM leaderboard_archive AS o
+                    WHERE o.level = h.level AND o.timestamp < h.timestamp)
+        FROM leaderboard_history AS h
+        WHERE h.username = ?
+        ORDER BY h.level
+    """, (username,))
+    history = cursor.fetchall()
+    conn.close()
+    return history
+
+# Deletes are not covered by the insert trigger, so bump the version by hand
+def bump_leaderboard_version(cursor):
+    cursor.execute("UPDATE last_update SET version = version + 1 WHERE id = 1")
+
+# Add these functions near the top after imports
+def get_latest_update_timestamp():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT timestamp FROM last_update WHERE id = 1")
+    timestamp = cursor.fetchone()[0]
+    conn.close()
+    return timestamp
+
+# Each player's best round and when they reached it, ranked in memory. The
+# (username, level) pair is unique, so the bare timestamp column is the one from
+# the MAX(level) row; the covering index answers this without a sort.
+def load_standings():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(STANDINGS_SQL)
+    rows = cursor.fetchall()
+    conn.close()
+    return Standings.from_rows(rows)
+
+# Latest level and position for each user, as a DataFrame (None when nobody has scored)
+def get_current_leaderboard():
+    standings = load_standings()
+    return standings.frame() if len(standings) else None
+
+# Wall-clock text for an epoch-millisecond timestamp, in the server's local zone.
+# Only called when a row is rendered; queries and caches keep the integers.
+def format_epoch_ms(epoch_ms, fmt="%H:%M:%S"):
+    return time.strftime(fmt, time.localtime(epoch_ms / 1000))
+
+# Load the hints for a single level
+def get_current_hints(level):
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT hints FROM questions WHERE level = ?", (level,))
+    result = cursor.fetchone()
+    conn.close()
+    return json.loads(result[0]) if result else []
+
+# Current (leaderboard, questions) version counters; a single primary-key lookup
+def get_data_versions():
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, questions_version FROM last_update WHERE id = 1")
+    versions = cursor.fetchone()
+    conn.close()
+    return versions
+
+# How long a worker trusts its cached version before asking the database again
+VERSION_CHECK_INTERVAL_SEC = 0.5
+
+# Process-local cache of a query result, shared by every session in the worker.
+# Other workers' writes are noticed through the version counters in last_update.
+class VersionedCache:
+    def __init__(self, loader, version_index, check_interval=VERSION_CHECK_INTERVAL_SEC):
+        self._loader = loader
+        self._version_index = version_index
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        return self.get_versioned()[1]
+
+    # (version, value), read together so the pair is consistent. `fresh`
+    # checks the version now even if it was checked moments ago.
+    def get_versioned(self, fresh=False):
+        with self._lock:
+            now = time.monotonic()
+            if not fresh and self._version is not None and now - self._checked_at < self.check_interval:
+                self.hits += 1
+                return self._version, self._value
+            version = get_data_versions()[self._version_index]
+            self._checked_at = now
+            if version == self._version:
+                self.hits += 1
+                return self._version, self._value
+            # Record the version read before loading: a write that lands
+            # mid-load will simply trigger another reload on the next check
+            self._value = self._loader()
+            self._version = version
+            self.misses += 1
+            return self._version, self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+leaderboard_cache = VersionedCache(load_standings, 0)
+questions_cache = VersionedCache(load_questions, 1)
+
+# With several workers (run_workers.py), one process publishes the ranked
+# leaderboard to a memory-mapped file and the workers read it from there
+snapshot_reader = SnapshotReader(SNAPSHOT_FILE) if SNAPSHOT_FILE else None
+
+# Cached reads for the player views
+def cached_standings():
+    return versioned_standings()[1]
+
+# (leaderboard version, Standings) from the snapshot when there is a usable one
+def versioned_standings(fresh=False):
+    if snapshot_reader is not None:
+        version, standings = snapshot_reader.get_versioned()
+        if standings is not None:
+            return version, standings
+    return leaderboard_cache.get_versioned(fresh)
+
+def cached_questions():
+    return questions_cache.get()
@@ -0,0 +1,92 @@
+import json
+import threading
+from collections import OrderedDict
+
+import ranking
+
+# Leaderboard updates as row-level deltas instead of whole tables. The last
+# DELTA_HISTORY ranked versions are kept, so a client that says which version
+# it has can be sent just the players that moved, joined or left since then.
+# A client further behind than that, or a delta that would touch more than
+# MAX_DELTA_SHARE of the players, gets the full standings instead.
+DELTA_HISTORY = 32
+MAX_DELTA_SHARE = 0.25
+
+
+# Changes from version `since` to `version`. `moved` and `new` rows are
+# [player, position, round, reached]; `removed` is a list of players. To apply
+# one: drop the removed and moved players, then insert the moved and new rows
+# at their positions in ascending order. Everyone else keeps their order.
+class Delta:
+    __slots__ = ("since", "version", "players", "moved", "new", "removed")
+
+    def __init__(self, since, version, old, standings):
+        moved, added, removed = ranking.diff(old, standings)
+        self.since = since
+        self.version = version
+        self.players = len(standings)
+        self.moved = _rows(standings, moved)
+        self.new = _rows(standings, added)
+        self.removed = removed.tolist()
+
+    def __len__(self):
+        return len(self.moved) + len(self.new) + len(self.removed)
+
+    def payload(self):
+        return {"version": self.version, "since": self.since, "players": self.players,
+                "moved": self.moved, "new": self.new, "removed": self.removed}
+
+    def encode(self):
+        return json.dumps(self.payload(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _rows(standings, indexes):
+    return [[player, position, level, reached] for player, position, level, reached in zip(
+        standings.usernames[indexes].tolist(), standings.positions[indexes].tolist(),
+        standings.levels[indexes].tolist(), standings.timestamps[indexes].tolist())]
+
+
+# Recent (version, standings) pairs, fed by whatever sees new versions (the
+# broadcast hub, the JSON endpoint). Standings are immutable and shared, so
+# keeping a few costs only the ones that are no longer current.
+class DeltaLog:
+    def __init__(self, history=DELTA_HISTORY, max_share=MAX_DELTA_SHARE):
+        self.history = history
+        self.max_share = max_share
+        self._lock = threading.Lock()
+        self._versions = OrderedDict()
+        self.deltas = 0
+        self.fallbacks = 0
+
+    def record(self, version, standings):
+        if version is None:
+            return
+        with self._lock:
+            if version in self._versions:
+                return
+            self._versions[version] = standings
+            while len(self._versions) > self.history:
+                self._versions.popitem(last=False)
+
+    def standings_at(self, version):
+        with self._lock:
+            return self._versions.get(version)
+
+    # Delta from `since` to (version, standings), or None when the client
+    # should be sent the full standings instead
+    def since(self, since, version, standings):
+        self.record(version, standings)
+        old = self.standings_at(since)
+        if old is None:
+            self.fallbacks += 1
+            return None
+        delta = Delta(since, version, old, standings)
+        if len(delta) > max(1, len(standings) * self.max_share):
+            self.fallbacks += 1
+            return None
+        self.deltas += 1
+        return delta
+
+
+# Shared by the views in this process
+history = DeltaLog()
@@ -0,0 +1,171 @@
+import json
+import threading
+from typing import NamedTuple
+
+import database
+import write_retry
+from ranking import Standings
+from rate_limiter import SubmissionRateLimiter
+from resume_tokens import ActivePlayerCache, make_resume_token, verify_resume_token
+
+# Outcomes of GameEngine.submit
+CORRECT = "correct"
+WRONG = "wrong"
+RATE_LIMITED = "rate_limited"
+FINISHED = "finished"
+BUSY = "busy"  # right answer, but the database could not take the write
+
+# Longest name join() accepts, the same limit as the name box on the login page
+MAX_USERNAME_LENGTH = database.MAX_USERNAME_LENGTH
+
+
+# One round as a player sees it. `level` is the player level that shows it
+# (its position in the question list), `round` the number admins gave it.
+class Question:
+    __slots__ = ("level", "round", "text", "answer", "hints", "image_url")
+
+    level: int
+    round: int
+    text: str
+    answer: str
+    hints: list[str]
+    image_url: str | None
+
+    def __init__(self, level: int, row: tuple):
+        self.level = level
+        self.round = row[0]
+        self.text = row[1]
+        self.answer = row[2]
+        self.hints = json.loads(row[3]) if row[3] else []
+        self.image_url = row[4] if len(row) > 4 else None
+
+    def check(self, answer: str) -> bool:
+        return answer.lower() == self.answer.lower()
+
+
+# What submit() did: one of the outcomes above, and the player's level after it
+class SubmitResult(NamedTuple):
+    status: str
+    level: int
+
+    @property
+    def correct(self) -> bool:
+        return self.status == CORRECT
+
+
+class Joined(NamedTuple):
+    level: int
+    token: str
+
+
+class Resumed(NamedTuple):
+    username: str
+    level: int
+
+
+# The game rules without any rendering: joining and resuming, serving the
+# current question, checking answers and advancing players, and the ranked
+# standings. One engine per process holds the process-wide state the views
+# share: the submission rate limiter, the cache of active players' levels, and
+# the parsed questions. Reads go through database's versioned caches and the
+# published snapshot, so other processes' writes are picked up as usual.
+class GameEngine:
+    def __init__(self, rate_limiter: SubmissionRateLimiter | None = None,
+                 players: ActivePlayerCache | None = None):
+        self.rate_limiter = rate_limiter or SubmissionRateLimiter(database.get_db_connection)
+        self.players = players or ActivePlayerCache()
+        self._questions_lock = threading.Lock()
+        self._questions_source = None
+        self._questions = []
+        write_retry.guard.drop_listeners.append(self._write_dropped)
+
+    # Create the player or load their progress. Raises ValueError for an empty
+    # or over-long name, and WriteUnavailable if the database is saturated and
+    # cannot queue it.
+    def join(self, username: str) -> Joined:
+        username = username.strip()
+        if not username:
+            raise ValueError("username must not be empty")
+        level = database.bootstrap_player(username)
+        self.players.put(username, level)
+        return Joined(level, make_resume_token(username))
+
+    # The player behind a resume token, or None if it is not usable
+    def resume(self, token: str) -> Resumed | None:
+        username = verify_resume_token(token)
+        if username is None:
+            return None
+        level = self.level_of(username)
+        if level is None:
+            return None  # player was deleted since the token was issued
+        return Resumed(username, level)
+
+    def level_of(self, username: str) -> int | None:
+        level = self.players.get(username)
+        if level is None:
+            level = database.get_player_level(username)
+            if level is not None:
+                self.players.put(username, level)
+        return level
+
+    # Parsed once per questions version, not on every rerun
+    def questions(self) -> list[Question]:
+        rows = database.cached_questions()
+        with self._questions_lock:
+            if rows is not self._questions_source:
+                self._questions = [Question(level, row) for level, row in enumerate(rows)]
+                self._questions_source = rows
+            return self._questions
+
+    def question_count(self) -> int:
+        return len(self.questions())
+
+    # The question for a player on `level`, or None once they have finished
+    def current_question(self, level: int) -> Question | None:
+        questions = self.questions()
+        return questions[level] if level < len(questions) else None
+
+    # Check an answer for the player's current level and advance them if it is
+    # right. `level` is the level the player answered on; if another tab moved
+    # them on already, the returned level is where they really are. The rate
+    # limit comes first, so rejected attempts cost no database or string work.
+    def submit(self, username: str, level: int, answer: str, ip: str | None = None) -> SubmitResult:
+        if not self.rate_limiter.allow(username, ip):
+            return SubmitResult(RATE_LIMITED, level)
+        question = self.current_question(level)
+        if question is None:
+            return SubmitResult(FINISHED, level)
+        if not question.check(answer):
+            return SubmitResult(WRONG, level)
+        try:
+            level = database.update_user_progress(username, level)
+        except write_retry.WriteUnavailable:
+            return SubmitResult(BUSY, level)
+        self.players.put(username, level)
+        return SubmitResult(CORRECT, level)
+
+    def standings(self) -> Standings:
+        return database.cached_standings()
+
+    # (position, round, percentile, medal) for a ranked player, else None
+    def rank_of(self, username: str) -> tuple[int, int, int, str] | None:
+        return self.standings().rank_of(username)
+
+    # Drop what this process remembers about a player (after an admin
+    # deletes or resets them), or about every player (after a restore)
+    def forget(self, username: str | None = None) -> None:
+        if username is None:
+            self.players.clear()
+        else:
+            self.players.discard(username)
+
+    # A queued join or advance was reported as done but never reached the
+    # database. Forget the level it promised, so the next read comes from the
+    # database; a player told they advanced fails the compare-and-set on
+    # their next answer and is put back on their real level.
+    def _write_dropped(self, write, args) -> None:
+        self.forget(args[0])  # every player write takes the username first
+
+    def close(self) -> None:
+        write_retry.guard.drop_listeners.remove(self._write_dropped)
+        self.rate_limiter.close()
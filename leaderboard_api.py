@@ -0,0 +1,281 @@
+"""Read-only JSON leaderboard over HTTP, for spectator screens and bots.
+
+    python leaderboard_api.py --port 8600
+
+GET /leaderboard.json returns the ranked standings (?limit=N for the top N,
+with N rounded up to one of LIMITS so each version has few bodies to cache).
+With ?since=V it returns only what changed since version V, as a delta (see
+deltas.py), or the full standings if V is too old or the delta too big.
+GET /events is a server-sent-event stream of leaderboard changes (see
+broadcast.py). GET /spectator is the big-screen page for the venue projector
+(see spectator.py); when /events reports a change it fetches
+/spectator/rows?since=V, the changed rows of its table.
+
+The ETag is the leaderboard version from last_update, so a request that sends
+it back in If-None-Match gets an empty 304 until someone solves a round.
+Bodies come from the published snapshot (CRYPTIC_HUNT_SNAPSHOT) when there is
+one, otherwise from this process's versioned cache; requests never query the
+database themselves, and each body is encoded (and gzipped for clients that
+accept it) once per version.
+
+run_workers.py starts this next to the workers.
+"""
+import argparse
+import gzip
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import broadcast
+import database
+import deltas
+import spectator
+
+API_HOST = "127.0.0.1"
+# 0 disables it; run_workers.py serves it from its own process and sets 0 for the workers
+API_PORT = int(os.environ.get("CRYPTIC_HUNT_API_PORT", "8600"))
+
+# Allowed ?limit= values; others are rounded up, and anything past the last
+# is capped at it
+LIMITS = (10, 15, 25, 50, 100, 250, 500, 1000)
+
+# Path -> (kind, content type); each kind has a renderer in RENDERERS
+PATHS = {
+    "/leaderboard.json": ("json", "application/json; charset=utf-8"),
+    "/leaderboard": ("json", "application/json; charset=utf-8"),
+    "/spectator": ("page", "text/html; charset=utf-8"),
+    "/spectator/": ("page", "text/html; charset=utf-8"),
+    "/spectator/table": ("table", "text/html; charset=utf-8"),
+    "/spectator/rows": ("rows", "application/json; charset=utf-8"),
+}
+
+
+# Response bodies for the current leaderboard version, keyed by
+# (kind, limit, since, gzipped). Rendered on the first request after a change.
+# `since` is only part of the key while it names a version the delta log
+# holds; a delta that falls back to the full body is stored under None.
+class LeaderboardBodies:
+    def __init__(self, source=database.versioned_standings, log=deltas.history):
+        self._source = source
+        self._log = log
+        self._lock = threading.Lock()
+        self._version = None
+        self._bodies = {}
+        self.encoded = 0
+
+    # (version, body) for the standings as they are now. With `since`, kinds
+    # that have a delta renderer send only what changed since that version.
+    def get(self, kind="json", limit=None, compressed=False, since=None):
+        version, standings = self._source()
+        self._log.record(version, standings)
+        if kind not in DELTA_RENDERERS or self._log.standings_at(since) is None:
+            since = None
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._bodies = {}
+            if since is not None:
+                delta = self._bodies.get((kind, limit, since, False))
+                if delta is None:
+                    delta = DELTA_RENDERERS[kind](self._log, since, version, standings, limit) or FULL
+                    self._bodies[kind, limit, since, False] = delta
+                    self.encoded += 1
+                if delta is not FULL:
+                    return version, self._compressed((kind, limit, since), delta, compressed)
+            key = (kind, limit, None)
+            body = self._bodies.get(key + (False,))
+            if body is None:
+                body = self._bodies[key + (False,)] = RENDERERS[kind](version, standings, limit)
+                self.encoded += 1
+            return version, self._compressed(key, body, compressed)
+
+    # Called with the lock held
+    def _compressed(self, key, body, compressed):
+        if not compressed:
+            return body
+        gzipped = self._bodies.get(key + (True,))
+        if gzipped is None:
+            gzipped = self._bodies[key + (True,)] = gzip.compress(body, compresslevel=6)
+        return gzipped
+
+
+# Marks a cached delta that fell back to the full body
+FULL = b""
+
+
+# Round a requested limit up to the nearest of LIMITS
+def clamp_limit(limit):
+    if limit is None:
+        return None
+    return next((allowed for allowed in LIMITS if allowed >= limit), LIMITS[-1])
+
+
+def encode(version, standings, limit=None):
+    n = len(standings) if limit is None else min(limit, len(standings))
+    rows = [
+        {"position": position, "player": player, "round": level, "reached": reached,
+         "percentile": percentile, "medal": medal}
+        for position, player, level, reached, percentile, medal in zip(
+            standings.positions[:n].tolist(), standings.usernames[:n].tolist(),
+            standings.levels[:n].tolist(), standings.timestamps[:n].tolist(),
+            standings.percentiles[:n].tolist(), standings.medals[:n].tolist())
+    ]
+    return json.dumps({"version": version, "players": len(standings), "standings": rows},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_delta(log, since, version, standings, limit=None):
+    delta = log.since(since, version, standings)
+    return delta.encode() if delta is not None else None
+
+
+def changed_rows(log, since, version, standings, limit=None):
+    old = log.standings_at(since)
+    return spectator.render_changed_rows(version, standings, old, limit) if old is not None else None
+
+
+RENDERERS = {
+    "json": encode,
+    "page": spectator.render_page,
+    "table": spectator.render_table,
+    "rows": spectator.render_rows,
+}
+
+# Kind -> renderer(log, since, version, standings, limit) for ?since=V; each
+# returns None when the full body should be sent instead
+DELTA_RENDERERS = {
+    "json": encode_delta,
+    "rows": changed_rows,
+}
+
+
+def etag_for(version, kind, limit):
+    tag = str(version) if kind == "json" else f"{kind}-{version}"
+    return f'"{tag}"' if limit is None else f'"{tag}-{limit}"'
+
+
+# True if an If-None-Match header names `etag` (weak or strong) or is "*"
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class LeaderboardHandler(BaseHTTPRequestHandler):
+    server_version = "CrypticHuntLeaderboard/1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/events" and self.server.hub is not None:
+            self._stream_events()
+            return
+        if url.path not in PATHS:
+            self.send_error(404)
+            return
+        kind, content_type = PATHS[url.path]
+        query = parse_qs(url.query)
+        try:
+            limit = int(query.get("limit", [0])[0]) or None
+            since = int(query["since"][0]) if "since" in query else None
+        except ValueError:
+            self.send_error(400, "limit and since must be integers")
+            return
+        if limit is not None and limit < 0:
+            self.send_error(400, "limit must not be negative")
+            return
+        if kind == "json" and limit is not None and since is not None:
+            self.send_error(400, "since cannot be combined with limit")
+            return
+        limit = clamp_limit(limit)
+
+        compressed = "gzip" in self.headers.get("Accept-Encoding", "")
+        version, body = self.server.bodies.get(kind, limit, compressed, since)
+        etag = etag_for(version, kind, limit)
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.server.not_modified += 1
+            self.send_response(304)
+            self._common_headers(etag)
+            self.end_headers()
+            return
+
+        self.server.served += 1
+        self.send_response(200)
+        self._common_headers(etag)
+        self.send_header("Content-Type", content_type)
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Hold the connection open and forward the hub's messages as they come,
+    # with a comment line every so often so proxies keep it alive
+    def _stream_events(self):
+        subscription = self.server.hub.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("X-Accel-Buffering", "no")  # nginx: do not buffer the stream
+            self.end_headers()
+            self.wfile.write(b"retry: 2000\n\n" + self.server.hub.hello(self.headers.get("Last-Event-ID")))
+            self.wfile.flush()
+            while True:
+                message = subscription.get()
+                self.wfile.write(message if message is not None else b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            subscription.close()
+
+    def _common_headers(self, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")  # always revalidate; a 304 is cheap
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def log_message(self, format, *args):
+        pass  # screens poll every few seconds; do not log each request
+
+
+class LeaderboardServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, bodies=None, hub=None):
+        super().__init__(address, LeaderboardHandler)
+        self.bodies = bodies or LeaderboardBodies()
+        self.hub = hub
+        self.served = 0
+        self.not_modified = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="leaderboard-api", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--db", default=database.DATABASE_FILE)
+    args = parser.parse_args()
+
+    database.DATABASE_FILE = args.db
+    server = LeaderboardServer((args.host, args.port), hub=broadcast.BroadcastHub().start())
+    print(f"serving the leaderboard on http://{args.host}:{args.port}/leaderboard.json "
+          f"and http://{args.host}:{args.port}/spectator")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
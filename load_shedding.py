@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from collections import deque
+
+import database
+
+# Adaptive refresh cadence. Each worker watches how long its reruns take and
+# how long writers wait for the database lock; when either stays above its
+# limit, the leaderboard views step down a level (refresh less often, drop the
+# table styling, show only the top of the table), and step back up once the
+# pressure has stayed low for RECOVERY_HOLD_SEC. CRYPTIC_HUNT_LOAD_SHEDDING=0
+# pins the normal level.
+LOAD_SHEDDING_ENABLED = os.environ.get("CRYPTIC_HUNT_LOAD_SHEDDING", "1") not in ("", "0")
+RERUN_LIMIT_SEC = float(os.environ.get("CRYPTIC_HUNT_RERUN_LIMIT_MS", "250")) / 1000
+LOCK_WAIT_LIMIT_SEC = float(os.environ.get("CRYPTIC_HUNT_LOCK_WAIT_LIMIT_MS", "50")) / 1000
+WINDOW_SEC = 10  # reruns and lock waits older than this are not considered
+EVALUATE_INTERVAL_SEC = 2  # at most one step per interval
+RECOVERY_HOLD_SEC = 20
+RECOVER_BELOW = 0.5  # pressure under half the limits counts as calm
+
+
+# How the leaderboard views behave at one degradation level
+class Level:
+    __slots__ = ("index", "name", "player_refresh", "login_refresh", "styled", "top")
+
+    def __init__(self, index, name, player_refresh, login_refresh, styled, top):
+        self.index = index
+        self.name = name
+        self.player_refresh = player_refresh  # seconds between game page reruns
+        self.login_refresh = login_refresh  # seconds between login page reruns
+        self.styled = styled
+        self.top = top  # rows shown, None for all
+
+
+LEVELS = [
+    Level(0, "normal", 1, 2, True, None),
+    Level(1, "busy", 2, 4, True, 100),
+    Level(2, "strained", 4, 8, False, 50),
+    Level(3, "overloaded", 8, 15, False, 20),
+]
+
+
+# Times one rerun; finish() is safe to call more than once
+class RerunTimer:
+    def __init__(self, controller):
+        self._controller = controller
+        self._started = time.perf_counter()
+        self._done = False
+
+    def finish(self):
+        if not self._done:
+            self._done = True
+            self._controller.record_rerun(time.perf_counter() - self._started)
+
+
+class LoadController:
+    def __init__(self, rerun_limit=RERUN_LIMIT_SEC, lock_wait_limit=LOCK_WAIT_LIMIT_SEC,
+                 enabled=LOAD_SHEDDING_ENABLED, lock_waits=database.lock_waits):
+        self.rerun_limit = rerun_limit
+        self.lock_wait_limit = lock_wait_limit
+        self.enabled = enabled
+        self._lock_waits = lock_waits
+        self._lock = threading.Lock()
+        self._reruns = deque(maxlen=5000)  # (finished at, seconds)
+        self._waits = deque(maxlen=5000)  # (seen at, seconds)
+        self._waits_seen = lock_waits.count
+        self._evaluated_at = time.monotonic()
+        self._calm_since = None
+        self.level = LEVELS[0]
+        self.pressure = 0.0
+        self.rerun_p95 = 0.0
+        self.lock_wait_p95 = 0.0
+        self.changes = deque(maxlen=50)  # (wall time, level name, pressure)
+
+    def timer(self):
+        return RerunTimer(self)
+
+    def record_rerun(self, seconds):
+        with self._lock:
+            self._reruns.append((time.monotonic(), seconds))
+
+    # The level for this rerun, re-evaluated at most every EVALUATE_INTERVAL_SEC
+    def current(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.enabled and now - self._evaluated_at >= EVALUATE_INTERVAL_SEC:
+                self._evaluate(now)
+            return self.level
+
+    def _evaluate(self, now):
+        self._evaluated_at = now
+        # Lock waits carry no timestamps; pick up the ones recorded since last time
+        new = self._lock_waits.count - self._waits_seen
+        self._waits_seen = self._lock_waits.count
+        if new > 0:
+            self._waits.extend((now, seconds) for seconds in self._lock_waits.recent()[-new:])
+        for samples in (self._reruns, self._waits):
+            while samples and samples[0][0] < now - WINDOW_SEC:
+                samples.popleft()
+
+        self.rerun_p95 = _p95(self._reruns)
+        self.lock_wait_p95 = _p95(self._waits)
+        self.pressure = max(self.rerun_p95 / self.rerun_limit, self.lock_wait_p95 / self.lock_wait_limit)
+
+        index = self.level.index
+        if self.pressure > 1:
+            self._calm_since = None
+            if index < len(LEVELS) - 1:
+                self._change(LEVELS[index + 1])
+        elif self.pressure < RECOVER_BELOW and index > 0:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= RECOVERY_HOLD_SEC:
+                self._calm_since = now  # hold again before the next step up
+                self._change(LEVELS[index - 1])
+        else:
+            self._calm_since = None
+
+    def _change(self, level):
+        self.level = level
+        self.changes.appendleft((time.time(), level.name, self.pressure))
+
+
+def _p95(samples):
+    if not samples:
+        return 0.0
+    ordered = sorted(seconds for _, seconds in samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
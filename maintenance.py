@@ -0,0 +1,241 @@
+"""Background upkeep of the database file, and its offline counterpart.
+
+    python maintenance.py analyze
+    python maintenance.py vacuum
+
+In the app, planner statistics are refreshed, the WAL is checkpointed and free
+pages are handed back to the OS, but only when the game is quiet (judged from
+how fast players are solving rounds), and every task works in bounded steps
+that stop when traffic picks up again. The two commands above are the
+unbounded versions (a full ANALYZE, and a full VACUUM that also switches an
+older file to incremental auto-vacuum), for when the event is not running.
+CRYPTIC_HUNT_MAINTENANCE=0 turns the background part off; run_workers.py does
+that for the workers and runs it itself.
+"""
+import argparse
+import collections
+import json
+import os
+import threading
+import time
+
+import database
+
+MAINTENANCE_ENABLED = os.environ.get("CRYPTIC_HUNT_MAINTENANCE", "1") != "0"
+MAINTENANCE_LOG = os.environ.get("CRYPTIC_HUNT_MAINTENANCE_LOG", "maintenance.log")
+POLL_INTERVAL_SEC = 5.0
+
+# Correct submissions per second, across all workers, below which the game
+# counts as quiet (averaged over QUIET_WINDOW_SEC), and above which a running
+# task gives up (averaged over SPIKE_WINDOW_SEC)
+QUIET_RATE = float(os.environ.get("CRYPTIC_HUNT_MAINTENANCE_QUIET_RATE", "1"))
+SPIKE_RATE = float(os.environ.get("CRYPTIC_HUNT_MAINTENANCE_SPIKE_RATE", "5"))
+QUIET_WINDOW_SEC = 30.0
+SPIKE_WINDOW_SEC = 5.0
+
+# Pages released per incremental_vacuum step, between traffic checks
+VACUUM_STEP_PAGES = 512
+# Rows ANALYZE samples per index, so each table is a short step
+ANALYSIS_LIMIT = 1000
+
+
+class Deferred(Exception):
+    pass
+
+
+# Submission rate, from the leaderboard version counter: the insert trigger
+# bumps it once per round solved, whichever worker handled the answer
+class TrafficMonitor:
+    def __init__(self, get_version=lambda: database.get_data_versions()[0]):
+        self._get_version = get_version
+        self._samples = collections.deque()
+
+    def sample(self):
+        now = time.monotonic()
+        self._samples.append((now, self._get_version()))
+        while len(self._samples) > 1 and now - self._samples[1][0] >= QUIET_WINDOW_SEC:
+            self._samples.popleft()
+
+    # Solves per second over at least the last `window` seconds, or None until
+    # there is a sample that old
+    def rate(self, window):
+        if not self._samples:
+            return None
+        now, version = self._samples[-1]
+        baseline = None
+        for then, earlier in self._samples:
+            if now - then < window:
+                break
+            baseline = (then, earlier)
+        if baseline is None or baseline[0] == now:
+            return None
+        then, earlier = baseline
+        return (version - earlier) / (now - then)
+
+    # Called between steps of a running task
+    def check(self):
+        self.sample()
+        rate = self.rate(SPIKE_WINDOW_SEC)
+        if rate is not None and rate > SPIKE_RATE:
+            raise Deferred(f"{rate:.1f} solves/s")
+
+
+# Statistics are sampled (analysis_limit), one table per step; a database that
+# has never been analyzed gets every table, later runs let PRAGMA optimize pick
+def optimize(conn, monitor):
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    analyzed = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0]
+    if analyzed:
+        conn.execute("PRAGMA optimize")
+        return "PRAGMA optimize"
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall()]
+    for table in tables:
+        monitor.check()
+        conn.execute(f'ANALYZE "{table}"')
+    return f"sampled ANALYZE of {len(tables)} tables"
+
+
+# PASSIVE never waits for readers or blocks writers, so it is safe next to a
+# backup's long read transaction; whatever it cannot copy yet waits for next time
+def checkpoint(conn, monitor):
+    _, wal_pages, copied = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return f"{copied}/{wal_pages} WAL pages" + (" (readers still active)" if copied < wal_pages else "")
+
+
+def vacuum(conn, monitor):
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return f"{free} free pages; run `python maintenance.py vacuum` offline to reclaim them"
+    released = 0
+    while released < free:
+        monitor.check()
+        # executescript steps the pragma to completion; execute() would free a single page
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES});")
+        released += VACUUM_STEP_PAGES
+    return f"released {free} pages"
+
+
+class Task:
+    def __init__(self, name, run, interval):
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.last_run = None
+        self.deferred_since = None
+
+    def due(self, now):
+        return self.last_run is None or now - self.last_run >= self.interval
+
+
+def default_tasks():
+    return [
+        Task("optimize", optimize, 3600),
+        Task("checkpoint", checkpoint, 300),
+        Task("vacuum", vacuum, 1800),
+    ]
+
+
+# Runs due tasks whenever the game is quiet. Every run and every deferral is
+# appended to MAINTENANCE_LOG as one JSON line, which the admin panel reads.
+class MaintenanceScheduler:
+    def __init__(self, tasks=None, monitor=None, log_path=MAINTENANCE_LOG):
+        self.tasks = tasks if tasks is not None else default_tasks()
+        self.monitor = monitor or TrafficMonitor()
+        self.log_path = log_path
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name="maintenance", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.wait(POLL_INTERVAL_SEC):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error running maintenance: {e}")
+
+    def tick(self):
+        self.monitor.sample()
+        now = time.monotonic()
+        for task in self.tasks:
+            if not task.due(now):
+                continue
+            rate = self.monitor.rate(QUIET_WINDOW_SEC)
+            if rate is None:
+                return  # not enough history yet to tell
+            if rate > QUIET_RATE:
+                if task.deferred_since is None:
+                    task.deferred_since = now
+                    self._log(task.name, "deferred", 0.0, f"{rate:.1f} solves/s")
+                continue
+            self.run_task(task)
+
+    def run_task(self, task):
+        conn = database.get_db_connection()
+        start = time.perf_counter()
+        try:
+            detail, status = task.run(conn, self.monitor), "done"
+        except Deferred as e:
+            detail, status = f"stopped early at {e}", "deferred"
+        except Exception as e:
+            detail, status = str(e), "failed"
+        finally:
+            conn.close()
+        # A task cut short stays due and resumes at the next quiet moment
+        if status != "deferred":
+            task.last_run = time.monotonic()
+            task.deferred_since = None
+        self._log(task.name, status, time.perf_counter() - start, detail)
+
+    def _log(self, task, status, seconds, detail):
+        entry = {"at": time.strftime("%Y-%m-%d %H:%M:%S"), "task": task, "status": status,
+                 "ms": round(seconds * 1000, 1), "detail": detail}
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Error writing maintenance log: {e}")
+
+
+# The last `limit` log entries, newest first
+def recent_runs(path=MAINTENANCE_LOG, limit=50):
+    try:
+        with open(path) as f:
+            lines = collections.deque(f, maxlen=limit)
+    except OSError:
+        return []
+    return [json.loads(line) for line in reversed(lines)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=database.DATABASE_FILE)
+    parser.add_argument("command", choices=["analyze", "vacuum"])
+    args = parser.parse_args()
+
+    database.DATABASE_FILE = args.db
+    conn = database.get_db_connection()
+    start = time.perf_counter()
+    try:
+        if args.command == "analyze":
+            conn.execute("ANALYZE")
+            print(f"analyzed in {time.perf_counter() - start:.1f}s")
+        else:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            print(f"released {free} pages in {time.perf_counter() - start:.1f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,51 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import json
+import os
 import time
 from datetime import datetime
 from PIL import Image
 import base64
+from database import (
+    initialize_db, load_questions_from_csv, get_db_connection, load_questions,
+    load_players, delete_player, reset_player_progress, get_rank_history,
+    progress_listeners,
+)
+import engine
+from profiling import Profiler, profiling_requested
+import sqltrace
+import backups
+import broadcast
+import leaderboard_api
+import maintenance
+import load_shedding
+import write_retry
 
 # Set up the Streamlit page (must be the first command)
 st.set_page_config(layout="wide")  # Use the full width of the screen
 
+# Opt-in per-rerun profiling, enabled from the admin panel, with ?profile=1 in
+# the admin session, or with CRYPTIC_HUNT_PROFILE=1
+@st.cache_resource
+def get_profiler():
+    return Profiler()
+
+profile = get_profiler().start("app", profiling_requested(st.query_params,
+                                                         st.session_state.get("is_admin", False)))
+
+# Refresh cadence and leaderboard detail for this worker, stepped down while
+# reruns or database lock waits run slow (see load_shedding.py)
+@st.cache_resource
+def get_load_controller():
+    return load_shedding.LoadController()
+
+rerun_timer = get_load_controller().timer()
+
+# Close out this rerun's timings; call before sleeping or rerunning
+def finish_rerun():
+    get_profiler().finish(profile)
+    rerun_timer.finish()
+
 # Hide Streamlit menu, footer, and prevent code inspection
 st.markdown("""
     <style>
@@ -32,15 +68,6 @@ st.markdown("""
     </script>
     """, unsafe_allow_html=True)
 
-# Add these functions near the top after imports and before the main app code
-def get_current_hints(level):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT hints FROM questions WHERE level = ?", (level,))
-    result = cursor.fetchone()
-    conn.close()
-    return json.loads(result[0]) if result else []
-
 def show_hints_section(hints, current_level):
     # Display hints if available
     if hints:
@@ -72,60 +99,46 @@ def show_hints_section(hints, current_level):
     """, unsafe_allow_html=True)
 
 def update_game_leaderboard(leaderboard_container, player_stats_container):
-    df = get_current_leaderboard()
-    if df is not None:
-        # Format the leaderboard display
-        display_df = df.copy()
-        display_df["Rank"] = display_df["Position"].apply(lambda x: f"#{x}")
-        
-        # Add medal emojis for top 3
-        def get_medal(position):
-            medals = {1: "🥇", 2: "🥈", 3: "🥉"}
-            return medals.get(position, "")
-        
-        display_df["Player"] = display_df.apply(
-            lambda row: f"{get_medal(row['Position'])} {row['Username']}"
-            if row['Position'] <= 3
-            else row['Username'],
-            axis=1
-        )
-        
-        # Create a view for display
-        view_df = display_df[["Rank", "Player", "Round"]]
+    standings = get_engine().standings()
+    if len(standings):
+        load = get_load_controller().current()
+        # Rank, medal and percentile columns come precomputed from the ranking engine
+        df = standings.frame().head(load.top)
+        view_df = df[["Rank", "Player", "Round"]]
         
         # Highlight current user
-        def highlight_user(row):
-            player_name = row["Player"].replace("🥇 ", "").replace("🥈 ", "").replace("🥉 ", "")
-            if player_name == st.session_state.username:
-                return ['background-color: #2D2D2D; color: #FFFFFF'] * len(row)
-            return [''] * len(row)
+        def highlight_user(view):
+            styles = pd.DataFrame("", index=view.index, columns=view.columns)
+            styles[(df["Username"] == st.session_state.username).to_numpy()] = 'background-color: #2D2D2D; color: #FFFFFF'
+            return styles
         
-        # Style and display the main leaderboard
-        styled_df = (view_df.style
-                   .apply(highlight_user, axis=1)
-                   .set_properties(**{
-                       'text-align': 'center',
-                       'font-size': '14px',
-                       'padding': '8px'
-                   }))
+        # Style and display the main leaderboard; plain while the worker is under load
+        if load.styled:
+            table = (view_df.style
+                       .apply(highlight_user, axis=None)
+                       .set_properties(**{
+                           'text-align': 'center',
+                           'font-size': '14px',
+                           'padding': '8px'
+                       }))
+        else:
+            table = view_df
         
         with leaderboard_container:
             st.dataframe(
-                styled_df,
+                table,
                 use_container_width=True,
                 height=min(400, len(df) * 35 + 38)
             )
+            if len(df) < len(standings):
+                st.caption(f"Showing the top {len(df)} of {len(standings)} while the game is busy")
         
         # Show current player stats
-        user_data = df[df["Username"] == st.session_state.username]
+        entry = standings.rank_of(st.session_state.username)
         with player_stats_container:
-            if not user_data.empty:
-                position = user_data.iloc[0]["Position"]
-                level = user_data.iloc[0]["Round"]
-                total_players = len(df)
-                percentile = round((position/total_players)*100)
+            if entry:
+                position, level, percentile, medal = entry
                 
-                medal = get_medal(position)
                 rank_display = f"{medal} #{position}" if medal else f"#{position}"
                 
                 st.markdown(f"""
@@ -151,6 +164,158 @@ def update_game_leaderboard(leaderboard_container, player_stats_container):
             </div>
         """, unsafe_allow_html=True)
 
+# Waterfall of one profiled rerun plus per-section averages, for the admin panel
+def show_profile_waterfall():
+    profiler = get_profiler()
+    profiler.all_sessions = st.checkbox("Profile every session on this worker", value=profiler.all_sessions,
+                                        key="profile_all_sessions")
+    reruns = profiler.snapshot()
+    if not reruns:
+        st.info("No profiled reruns yet. Tick the box above, or set CRYPTIC_HUNT_PROFILE=1.")
+        return
+
+    labels = [f"{time.strftime('%H:%M:%S', time.localtime(r.wall_time))} {r.page} "
+              f"({r.total * 1000:.0f} ms)" for r in reruns]
+    index = st.selectbox("Rerun", range(len(reruns)), index=len(reruns) - 1,
+                         format_func=lambda i: labels[i])
+    rerun = reruns[index]
+    scale = 100 / max(rerun.total, 1e-9)
+    rows = []
+    for path, start, duration in sorted(rerun.sections, key=lambda s: s[1]):
+        rows.append(f"""
+            <div style='display: flex; align-items: center; font-size: 12px; margin: 2px 0;'>
+                <div style='width: 30%; padding-left: {(len(path) - 1) * 12}px;'>{path[-1]}</div>
+                <div style='width: 55%; position: relative; height: 14px; background: #2D2D2D;'>
+                    <div style='position: absolute; left: {start * scale:.2f}%; width: {max(duration * scale, 0.3):.2f}%;
+                                height: 100%; background: #4CAF50;'></div>
+                </div>
+                <div style='width: 15%; text-align: right;'>{duration * 1000:.1f} ms</div>
+            </div>
+        """)
+    st.markdown("".join(rows), unsafe_allow_html=True)
+
+    # Average of each section across all recent reruns
+    totals = {}
+    for r in reruns:
+        for path, _, duration in r.sections:
+            key = (r.page, " / ".join(path))
+            count, total = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, total + duration)
+    summary = pd.DataFrame(
+        [(page, name, count, total / count * 1000) for (page, name), (count, total) in totals.items()],
+        columns=["Page", "Section", "Samples", "Avg ms"]).sort_values("Avg ms", ascending=False)
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    st.caption(f"Folded samples for flamegraphs are appended to {profiler.samples_file} "
+               f"(rotated to {profiler.samples_file}.1 past {profiler.max_bytes // 2**20} MB)")
+
+# Statement timings, slow queries and captured query plans, for the admin panel
+def show_sql_trace():
+    queries, slow = sqltrace.tracer.snapshot()
+    if not queries:
+        st.info("No SQL traced yet." if sqltrace.TRACE_ENABLED
+                else "SQL tracing is off; set CRYPTIC_HUNT_SQL_TRACE=1 to turn it on.")
+        return
+
+    queries_df = pd.DataFrame(
+        [(sql, calls, total / calls * 1000, longest * 1000, rows / calls,
+          ", ".join(sqltrace.full_scans(plan or [])))
+         for sql, calls, total, longest, rows, plan in queries if calls],
+        columns=["Query", "Calls", "Avg ms", "Max ms", "Avg rows", "Full scan"],
+    ).sort_values("Avg ms", ascending=False)
+    st.write("#### Queries")
+    st.dataframe(queries_df, use_container_width=True, hide_index=True)
+
+    st.write(f"#### Slow queries (over {sqltrace.tracer.slow_ms:.0f} ms)")
+    if slow:
+        slow_df = pd.DataFrame(
+            [(time.strftime("%H:%M:%S", time.localtime(r.started)), r.duration * 1000, r.rows, r.sql)
+             for r in reversed(slow)],
+            columns=["At", "ms", "Rows", "Query"])
+        st.dataframe(slow_df, use_container_width=True, hide_index=True)
+    else:
+        st.info("No slow queries recorded.")
+
+    st.write("#### Query plan")
+    plans = {sql: plan for sql, _, _, _, _, plan in queries if plan}
+    if plans:
+        selected = st.selectbox("Query", list(plans), format_func=lambda sql: sql[:120])
+        st.code("\n".join(plans[selected]) or "(no plan)")
+
+def show_backups():
+    scheduler = get_backup_scheduler()
+    if scheduler is not None and scheduler.last is not None:
+        last = scheduler.last
+        st.caption(f"Last scheduled backup: {last.path} ({last.seconds:.1f}s, "
+                   f"{last.steps} steps), {scheduler.failures} failures")
+    if st.button("Back Up Now"):
+        try:
+            result = backups.create_backup()
+            st.success(f"Saved {result.path} in {result.seconds:.1f}s")
+        except Exception as e:
+            st.error(f"Error creating backup: {e}")
+
+    snapshots = backups.list_backups()
+    if not snapshots:
+        st.info(f"No backups in {backups.BACKUP_DIR}/ yet.")
+        return
+    st.dataframe(pd.DataFrame(
+        [(path, os.path.getsize(path) / 1024 / 1024,
+          time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getmtime(path))))
+         for path in snapshots],
+        columns=["Backup", "MB", "Taken"]), use_container_width=True, hide_index=True)
+
+    selected = st.selectbox("Restore to", snapshots)
+    confirmed = st.checkbox("Replace all questions, players and progress with this backup")
+    if st.button("Restore Backup", disabled=not confirmed):
+        try:
+            safety = backups.restore_backup(selected)
+            get_engine().forget()
+            st.success(f"Restored {selected}. The previous state was saved as {safety}.")
+        except Exception as e:
+            st.error(f"Error restoring backup: {e}")
+
+def show_maintenance():
+    runs = maintenance.recent_runs()
+    if not runs:
+        st.info(f"Nothing logged yet. Tasks start once the game has been quiet for "
+                f"{maintenance.QUIET_WINDOW_SEC:.0f}s.")
+        return
+    st.dataframe(pd.DataFrame(runs).rename(columns={
+        "at": "At", "task": "Task", "status": "Status", "ms": "ms", "detail": "Detail"}),
+        use_container_width=True, hide_index=True)
+
+def show_load():
+    controller = get_load_controller()
+    level = controller.current()
+    cols = st.columns(4)
+    cols[0].metric("Level", f"{level.index} · {level.name}")
+    cols[1].metric("Rerun p95", f"{controller.rerun_p95 * 1000:.0f} ms",
+                   help=f"Limit {controller.rerun_limit * 1000:.0f} ms")
+    cols[2].metric("Lock wait p95", f"{controller.lock_wait_p95 * 1000:.1f} ms",
+                   help=f"Limit {controller.lock_wait_limit * 1000:.0f} ms")
+    cols[3].metric("Pressure", f"{controller.pressure:.2f}")
+    top = f"top {level.top}" if level.top else "all players"
+    st.caption(f"Game page every {level.player_refresh}s, login page every {level.login_refresh}s, "
+               f"{top}, {'styled' if level.styled else 'plain'} tables"
+               + ("" if controller.enabled else " · adaptive refresh is turned off"))
+    if controller.changes:
+        st.dataframe(pd.DataFrame([
+            {"At": time.strftime("%H:%M:%S", time.localtime(at)), "Level": name, "Pressure": round(pressure, 2)}
+            for at, name, pressure in controller.changes]), use_container_width=True, hide_index=True)
+
+def show_write_retries():
+    stats = write_retry.guard.stats()
+    cols = st.columns(4)
+    cols[0].metric("Breaker", stats["breaker"], help=f"Opened {stats['opened']} times")
+    cols[1].metric("Retried", stats["retried"], help="Attempts repeated after 'database is locked'")
+    cols[2].metric("Queued", stats["queued"], help=f"{stats['pending']} waiting, {stats['flushed']} applied")
+    cols[3].metric("Lost", stats["dropped"] + stats["rejected"],
+                   help=f"{stats['rejected']} turned away with the queue full, {stats['dropped']} failed when applied")
+    st.caption(f"{stats['writes']} player writes, {stats['gave_up']} gave up after "
+               f"{write_retry.WRITE_RETRIES} retries, {stats['fast_failed']} skipped the database while "
+               f"the breaker was open or the queue was draining. The breaker opens after "
+               f"{write_retry.BREAKER_FAILURES} failed writes in a row for {write_retry.BREAKER_COOLDOWN_SEC:.0f}s.")
+
 def admin_page():
     inject_custom_css()
 
@@ -259,17 +424,24 @@ def admin_page():
             st.sidebar.table(players_df)
 
             player_to_manage = st.sidebar.selectbox("Select Player", [p[0] for p in players])
+            rank_history = get_rank_history(player_to_manage)
+            if rank_history:
+                st.sidebar.write("#### Rank Over Time")
+                history_df = pd.DataFrame(rank_history, columns=["Round", "Reached", "Rank"])
+                st.sidebar.line_chart(history_df, x="Round", y="Rank")
             col1, col2 = st.sidebar.columns(2)
             
             with col1:
                 if st.button("Delete Player"):
                     if delete_player(player_to_manage):
+                        get_engine().forget(player_to_manage)
                         st.success(f"Player {player_to_manage} deleted successfully!")
                         st.rerun()
                     
             with col2:
                 if st.button("Reset Progress"):
                     if reset_player_progress(player_to_manage):
+                        get_engine().forget(player_to_manage)
                         st.success(f"Progress reset for {player_to_manage}!")
                         st.rerun()
         else:
@@ -293,6 +465,34 @@ def admin_page():
         st.table(questions_df)
     else:
         st.info("No questions found in the database.")
+
+    # Export the standings exactly as the leaderboard ranks them
+    standings = get_engine().standings()
+    st.download_button(
+        "📥 Export Standings (CSV)",
+        data=standings.to_csv(),
+        file_name=f"standings-{time.strftime('%Y%m%d-%H%M%S')}.csv",
+        mime="text/csv",
+        disabled=not len(standings),
+    )
+
+    with st.expander("⏱️ Rerun Profiling"):
+        show_profile_waterfall()
+
+    with st.expander("🔍 SQL Trace"):
+        show_sql_trace()
+
+    with st.expander("💾 Backups"):
+        show_backups()
+
+    with st.expander("🧹 Maintenance"):
+        show_maintenance()
+
+    with st.expander("🚦 Load"):
+        show_load()
+
+    with st.expander("🔁 Write Retries"):
+        show_write_retries()
     st.markdown('</div>', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -324,253 +524,88 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # Constants
-DATABASE_FILE = "cryptic_hunt2025.db"
-QUESTIONS_CSV = "questions.csv"
 ADMIN_PASSWORD = "admin2025"  # Replace with a secure password in production
 
-# Initialize SQLite database and create tables
-def initialize_db():
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            level INTEGER DEFAULT 0
-        )
-    """)
-
-    # Create questions table with level starting from 0
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            level INTEGER UNIQUE NOT NULL,
-            question TEXT NOT NULL,
-            answer TEXT NOT NULL,
-            hints TEXT,
-            image_url TEXT  -- New column for image URL
-        )
-    """)
-
-    # Create leaderboard table with auto-updating timestamp
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS leaderboard (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            level INTEGER NOT NULL,
-            timestamp DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
-        )
-    """)
-
-    # Create a table to track last update
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS last_update (
-            id INTEGER PRIMARY KEY CHECK (id = 1),
-            timestamp DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
-        )
-    """)
-
-    # Insert initial last_update record if not exists
-    cursor.execute("""
-        INSERT OR IGNORE INTO last_update (id) VALUES (1)
-    """)
-
-    # Create trigger to update last_update timestamp
-    cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS update_leaderboard_timestamp
-        AFTER INSERT ON leaderboard
-        BEGIN
-            UPDATE last_update 
-            SET timestamp = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
-            WHERE id = 1;
-        END
-    """)
-
-    conn.commit()
-    conn.close()
-
-# Load questions from CSV and insert into the database
-def load_questions_from_csv():
+# Initialize the database and load questions from CSV, once per app process
+@st.cache_resource
+def setup_database():
+    initialize_db()
     try:
-        df = pd.read_csv(QUESTIONS_CSV)
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-
-        for _, row in df.iterrows():
-            level = row["Round"]
-            question = row["Question"]
-            answer = row["Answer"]
-            hints = json.dumps([row[f"Hint{i+1}"] for i in range(3) if f"Hint{i+1}" in row])
-
-            cursor.execute("""
-                INSERT OR IGNORE INTO questions (level, question, answer, hints)
-                VALUES (?, ?, ?, ?)
-            """, (level, question, answer, hints))
-
-        conn.commit()
-        conn.close()
+        load_questions_from_csv()
     except Exception as e:
         st.error(f"Error loading questions from CSV: {str(e)}")
 
-# Initialize the database and load questions from CSV
-initialize_db()
-load_questions_from_csv()
-
-# Database connection
-def get_db_connection():
-    return sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-
-# Load questions from the database
-def load_questions():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT level, question, answer, hints, image_url FROM questions ORDER BY level")
-    questions = cursor.fetchall()
-    conn.close()
-    return questions
-
-# Load leaderboard from the database (only latest entry per user)
-def load_leaderboard():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT username, MAX(level) as level, MIN(timestamp) as timestamp 
-        FROM leaderboard 
-        GROUP BY username 
-        ORDER BY level DESC, timestamp ASC
-    """)
-    leaderboard = cursor.fetchall()
-    conn.close()
-    return leaderboard
-
-# Get player's current rank
-def get_player_rank(username):
-    leaderboard = load_leaderboard()
-    for rank, entry in enumerate(leaderboard, start=1):
-        if entry[0] == username:
-            return rank
-    return None
-
-# Update user progress in the database
-def update_user_progress(username, level):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Update user's level
-    cursor.execute("UPDATE users SET level = ? WHERE username = ?", (level, username))
-    
-    # Add new leaderboard entry (trigger will update last_update timestamp)
-    cursor.execute("""
-        INSERT INTO leaderboard (username, level)
-        VALUES (?, ?)
-    """, (username, level))
-    
-    conn.commit()
-    conn.close()
-
-# Check user credentials
-def authenticate_user(username, password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-# Register a new user
-def register_user(username, password):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+with profile.section("setup_database"):
+    setup_database()
+
+# Scheduled online backups for this process, or None when they are turned off
+@st.cache_resource
+def get_backup_scheduler():
+    if backups.BACKUP_INTERVAL_SEC <= 0:
+        return None
+    return backups.BackupScheduler().start()
+
+get_backup_scheduler()
+
+# ANALYZE, checkpoints and vacuum at quiet moments, or None when turned off
+@st.cache_resource
+def get_maintenance_scheduler():
+    if not maintenance.MAINTENANCE_ENABLED:
+        return None
+    return maintenance.MaintenanceScheduler().start()
+
+get_maintenance_scheduler()
+
+# Leaderboard endpoint and broadcast hub for a single-process deployment, or
+# None when turned off (run_workers.py serves them itself and turns them off
+# in the workers). Solves in this process wake the hub straight away.
+@st.cache_resource
+def get_leaderboard_server():
+    if not leaderboard_api.API_PORT:
+        return None
+    hub = broadcast.BroadcastHub()
     try:
-        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False  # Username already exists
-    finally:
-        conn.close()
-
-# Add missing load_players function
-def load_players():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, level FROM users ORDER BY level DESC")
-    players = cursor.fetchall()
-    conn.close()
-    return players
-
-# Add missing delete_player function
-def delete_player(username):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        server = leaderboard_api.LeaderboardServer((leaderboard_api.API_HOST, leaderboard_api.API_PORT), hub=hub)
+    except OSError as e:
+        print(f"Error starting the leaderboard endpoint: {e}")
+        return None
+    progress_listeners.append(hub.start().wake)
+    return server.start()
+
+get_leaderboard_server()
+
+# Game rules and the state every session in this process shares (rate limiter,
+# active players' levels, parsed questions); the views below only render
+@st.cache_resource
+def get_engine():
+    return engine.GameEngine()
+
+# Whether the forwarding headers below come from our own proxy. run_workers.py
+# turns this on for the workers it starts behind deploy/nginx.conf; a plain
+# `streamlit run player.py` leaves it off, since clients could then send any
+# header they like and get a fresh rate limit bucket with each one.
+TRUSTED_PROXY = os.environ.get("CRYPTIC_HUNT_TRUSTED_PROXY", "0") not in ("", "0")
+
+# Client address as forwarded by the trusted reverse proxy, or None without
+# one (Streamlit does not expose the peer address, so submissions are then
+# only limited per player)
+def get_client_ip():
+    if not TRUSTED_PROXY:
+        return None
     try:
-        cursor.execute("DELETE FROM users WHERE username = ?", (username,))
-        cursor.execute("DELETE FROM leaderboard WHERE username = ?", (username,))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error deleting player: {e}")
-        return False
-    finally:
-        conn.close()
-
-# Add missing reset_player_progress function
-def reset_player_progress(username):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("UPDATE users SET level = 0 WHERE username = ?", (username,))
-        cursor.execute("DELETE FROM leaderboard WHERE username = ?", (username,))
-        conn.commit()
-        return True
-    except Exception as e:
-        print(f"Error resetting player progress: {e}")
-        return False
-    finally:
-        conn.close()
-
-# Add these functions near the top after imports
-def get_latest_update_timestamp():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT timestamp FROM last_update WHERE id = 1")
-    timestamp = cursor.fetchone()[0]
-    conn.close()
-    return timestamp
-
-def get_current_leaderboard():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get latest level and position for each user
-    cursor.execute("""
-        WITH UserRounds AS (
-            SELECT 
-                username,
-                level,
-                timestamp,
-                ROW_NUMBER() OVER (PARTITION BY username ORDER BY level DESC, timestamp ASC) as rn
-            FROM leaderboard
-        )
-        SELECT 
-            username,
-            level,
-            timestamp,
-            ROW_NUMBER() OVER (ORDER BY level DESC, timestamp ASC) as position
-        FROM UserRounds
-        WHERE rn = 1
-        ORDER BY level DESC, timestamp ASC
-    """)
-    
-    leaderboard = cursor.fetchall()
-    conn.close()
-    
-    if leaderboard:
-        df = pd.DataFrame(leaderboard, columns=["Username", "Round", "Timestamp", "Position"])
-        return df
+        headers = st.context.headers
+    except AttributeError:
+        return None
+    # The one trusted proxy is the nginx in deploy/nginx.conf. It overwrites
+    # X-Real-IP with the peer address, and appends that address to
+    # X-Forwarded-For. Earlier X-Forwarded-For entries come from the client
+    # and can be anything, so only the last hop is used.
+    real_ip = headers.get("X-Real-Ip")
+    if real_ip:
+        return real_ip.strip()
+    forwarded = headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
     return None
 
 # Update inject_custom_css function
@@ -951,48 +986,48 @@ if "level" not in st.session_state:
 if "hints_revealed" not in st.session_state:
     st.session_state.hints_revealed = {}  # Track revealed hints for each level
 
+# Pick a returning player back up from the resume token in the URL
+if st.session_state.username is None and "resume" in st.query_params:
+    resumed = get_engine().resume(st.query_params["resume"])
+    if resumed:
+        st.session_state.username, st.session_state.level = resumed
+    else:
+        del st.query_params["resume"]
+
 # Main page (name entry)
 if st.session_state.username is None:
+    profile.set_page("login")
     # Show leaderboard first
     st.markdown("### 🏆 Live Leaderboard")
     main_leaderboard_container = st.container()
     
-    with main_leaderboard_container:
-        df = get_current_leaderboard()
-        if df is not None:
-            # Format the leaderboard display
-            display_df = df.copy()
-            display_df["Rank"] = display_df["Position"].apply(lambda x: f"#{x}")
-            
-            # Add medal emojis for top 3
-            def get_medal(position):
-                medals = {1: "🥇", 2: "🥈", 3: "🥉"}
-                return medals.get(position, "")
-            
-            display_df["Player"] = display_df.apply(
-                lambda row: f"{get_medal(row['Position'])} {row['Username']}"
-                if row['Position'] <= 3
-                else row['Username'],
-                axis=1
-            )
-            
-            # Create a view for display
-            view_df = display_df[["Rank", "Player", "Round"]]
+    with main_leaderboard_container, profile.section("leaderboard"):
+        standings = get_engine().standings()
+        if len(standings):
+            load = get_load_controller().current()
+            # Rank and medal columns come precomputed from the ranking engine
+            df = standings.frame().head(load.top)
+            view_df = df[["Rank", "Player", "Round"]]
             
-            # Style the dataframe
-            styled_df = (view_df.style
-                       .set_properties(**{
-                           'text-align': 'center',
-                           'font-size': '14px',
-                           'padding': '8px',
-                           'background-color': '#2D2D2D'
-                       }))
+            # Style the dataframe; plain while the worker is under load
+            if load.styled:
+                table = (view_df.style
+                           .set_properties(**{
+                               'text-align': 'center',
+                               'font-size': '14px',
+                               'padding': '8px',
+                               'background-color': '#2D2D2D'
+                           }))
+            else:
+                table = view_df
             
             st.dataframe(
-                styled_df,
+                table,
                 use_container_width=True,
                 height=min(400, len(df) * 35 + 38)
             )
+            if len(df) < len(standings):
+                st.caption(f"Showing the top {len(df)} of {len(standings)} while the game is busy")
             
             st.markdown(f"""
                 <div style='text-align: right; padding: 5px; font-size: 12px; color: #666;'>
@@ -1011,32 +1046,23 @@ if st.session_state.username is None:
     with tab1:
         # Name entry section
         st.subheader("Enter Your Name to Play")
-        username = st.text_input("Your Name", key="name_input")
+        username = st.text_input("Your Name", key="name_input", max_chars=engine.MAX_USERNAME_LENGTH)
         
         if st.button("Start Playing"):
             if username.strip():
                 st.session_state.username = username.strip()
                 
-                # Check if this is a new player or returning player
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                # Check if player exists
-                cursor.execute("SELECT level FROM users WHERE username = ?", (st.session_state.username,))
-                result = cursor.fetchone()
-                
-                if result:
-                    # Existing player - load their progress
-                    st.session_state.level = result[0]
+                # Create new players and load returning players' progress in one go
+                try:
+                    st.session_state.level, st.query_params["resume"] = get_engine().join(st.session_state.username)
+                except ValueError as e:
+                    del st.session_state.username
+                    st.error(f"Please choose another name: {e}.")
+                except write_retry.WriteUnavailable:
+                    del st.session_state.username
+                    st.warning("The game is very busy right now. Please try again in a few seconds.")
                 else:
-                    # New player - create entry
-                    cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", 
-                                 (st.session_state.username, "dummy_password"))
-                    conn.commit()
-                    st.session_state.level = 0
-                
-                conn.close()
-                st.rerun()
+                    st.rerun()
             else:
                 st.error("Please enter a name to continue")
     
@@ -1050,33 +1076,37 @@ if st.session_state.username is None:
                 st.session_state.username = "admin"
                 st.session_state.is_admin = True
                 st.success("Welcome, Admin!")
+                finish_rerun()
                 time.sleep(1)  # Add a small delay to avoid flickering
                 st.rerun()
             else:
                 st.error("Invalid admin credentials.")
 
     # Auto-refresh for main page leaderboard
-    time.sleep(2)
+    finish_rerun()
+    time.sleep(get_load_controller().current().login_refresh)
     st.rerun()
 
 # Player's game page
 elif st.session_state.username and not st.session_state.get("is_admin", False):
-    inject_custom_css()
+    profile.set_page("player")
+    with profile.section("css"):
+        inject_custom_css()
     
-    questions = load_questions()
+    with profile.section("load_questions"):
+        question = get_engine().current_question(st.session_state.level)
     current_level = st.session_state.level
 
     # Main content area for question
-    if current_level < len(questions):
-        question_data = questions[current_level]
-        hints = json.loads(question_data[3])
-        image_url = question_data[4] if len(question_data) > 4 else None
+    if question is not None:
+        hints = question.hints
+        image_url = question.image_url
 
         # Question card in main area
         st.markdown(f"""
             <div class="question-card">
-                <div class="level-title">Round {question_data[0]}</div>
-                <div class="question-text">{question_data[1]}</div>
+                <div class="level-title">Round {question.round}</div>
+                <div class="question-text">{question.text}</div>
         """, unsafe_allow_html=True)
 
         # Display image if URL is provided
@@ -1103,9 +1133,13 @@ elif st.session_state.username and not st.session_state.get("is_admin", False):
         # Answer input
         answer = st.text_input("", key="answer_input", label_visibility="collapsed")
         if st.button("Submit"):
-            if answer.lower() == question_data[2].lower():
-                update_user_progress(st.session_state.username, current_level + 1)
-                st.session_state.level += 1
+            result = get_engine().submit(st.session_state.username, current_level, answer, get_client_ip())
+            if result.status == engine.RATE_LIMITED:
+                st.warning("Too many attempts. Please wait a moment before submitting again.")
+            elif result.status == engine.BUSY:
+                st.warning("Correct, but the game is very busy and could not save it. Please submit again.")
+            elif result.correct:
+                st.session_state.level = result.level
                 st.rerun()
             else:
                 st.error("Submit correct answer to progress next level!")
@@ -1115,7 +1149,7 @@ elif st.session_state.username and not st.session_state.get("is_admin", False):
             st.markdown(f"### Player: {st.session_state.username}")
             
             # Hints Section
-            with st.expander("🎯 Hints", expanded=True):
+            with st.expander("🎯 Hints", expanded=True), profile.section("hints"):
                 show_hints_section(hints, current_level)
 
             # Add separator
@@ -1134,10 +1168,12 @@ elif st.session_state.username and not st.session_state.get("is_admin", False):
                 player_stats_container = st.empty()
 
             # Update leaderboard display
-            update_game_leaderboard(leaderboard_container, player_stats_container)
+            with profile.section("leaderboard"):
+                update_game_leaderboard(leaderboard_container, player_stats_container)
 
             # Auto-refresh
-            time.sleep(1)
+            finish_rerun()
+            time.sleep(get_load_controller().current().player_refresh)
             st.rerun()
 
     else:
@@ -1172,23 +1208,25 @@ elif st.session_state.username and not st.session_state.get("is_admin", False):
         
         if st.button("Play Again with Different Name"):
             st.session_state.clear()
+            st.query_params.clear()
             st.rerun()
 
 # Admin page
 elif st.session_state.username == "admin" and st.session_state.get("is_admin", False):
-    admin_page()
+    profile.set_page("admin")
+    with profile.section("admin_page"):
+        admin_page()
 
 # Initialize session state for current_level
 if "level" not in st.session_state:
     st.session_state.level = 0  # Default starting level
 
-# Ensure questions are loaded
-questions = load_questions()  # Assuming this function loads the questions from the database
+# Current question, or None when every round is done
+question = get_engine().current_question(st.session_state.level)
 
 # Check if current_level is within the valid range
-if st.session_state.level < len(questions):
-    question_data = questions[st.session_state.level]  # Extract the current question data
-    image_url = question_data[4] if len(question_data) > 4 else None  # Extract image_url
+if question is not None:
+    image_url = question.image_url
 
     # Display image if URL is provided
     if image_url:
@@ -1222,8 +1260,8 @@ if st.session_state.level < len(questions):
     # Display the question and answer input
     st.markdown(f"""
         <div class="question-card">
-            <div class="level-title">Round {question_data[0]}</div>
-            <div class="question-text">{question_data[1]}</div>
+            <div class="level-title">Round {question.round}</div>
+            <div class="question-text">{question.text}</div>
             <div class="answer-section">
                 <label>Your answer:</label>
             </div>
@@ -1233,9 +1271,13 @@ if st.session_state.level < len(questions):
     # Answer input
     answer = st.text_input("", key="answer_input", label_visibility="collapsed")
     if st.button("Submit"):
-        if answer.lower() == question_data[2].lower():
-            update_user_progress(st.session_state.username, st.session_state.level + 1)
-            st.session_state.level += 1
+        result = get_engine().submit(st.session_state.username, st.session_state.level, answer, get_client_ip())
+        if result.status == engine.RATE_LIMITED:
+            st.warning("Too many attempts. Please wait a moment before submitting again.")
+        elif result.status == engine.BUSY:
+            st.warning("Correct, but the game is very busy and could not save it. Please submit again.")
+        elif result.correct:
+            st.session_state.level = result.level
             st.rerun()
         else:
             st.error("Submit correct answer to progress to the next level!")
@@ -1268,4 +1310,6 @@ else:
             <h1>🎉 Quiz Completed! 🎉</h1>
             <p>Congratulations, you've answered all the questions!</p>
         </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+finish_rerun()
@@ -0,0 +1,113 @@
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+
+# Profiling is opt-in: set CRYPTIC_HUNT_PROFILE=1 for every session, switch it
+# on for every session of one worker from the admin panel, or add ?profile=1 to
+# the URL of the admin session. Players cannot turn it on.
+PROFILE_ENV_VAR = "CRYPTIC_HUNT_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+
+# Samples are appended in folded-stack format ("frame;frame;frame <microseconds>"),
+# which flamegraph.pl and speedscope read directly. Past SAMPLES_MAX_BYTES the
+# file is rotated to SAMPLES_FILE.1, replacing the previous one.
+SAMPLES_FILE = os.environ.get("CRYPTIC_HUNT_PROFILE_FILE", "profile_samples.folded")
+SAMPLES_MAX_BYTES = int(float(os.environ.get("CRYPTIC_HUNT_PROFILE_FILE_MB", "50")) * 1024 * 1024)
+RECENT_RERUNS = 200
+
+
+# Timings for one script rerun. Sections may be nested.
+class RerunProfile:
+    enabled = True
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.wall_time = time.time()
+        self.total = None
+        self.sections = []  # (path, start offset, duration) in seconds
+        self._stack = []
+
+    def set_page(self, page):
+        self.page = page
+
+    @contextlib.contextmanager
+    def section(self, name):
+        self._stack.append(name)
+        path = tuple(self._stack)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((path, start - self.started, time.perf_counter() - start))
+            self._stack.pop()
+
+    # Exclusive (self) time per stack, which is what folded stacks expect
+    def folded(self):
+        self_time = {(): self.total}
+        for path, _, duration in self.sections:
+            self_time[path] = self_time.get(path, 0.0) + duration
+            self_time[path[:-1]] = self_time.get(path[:-1], 0.0) - duration
+        lines = []
+        for path, seconds in self_time.items():
+            micros = int(seconds * 1e6)
+            if micros > 0:
+                lines.append(";".join(("rerun", self.page) + path) + f" {micros}")
+        return lines
+
+
+# Stand-in used when profiling is off, so call sites never need to check
+class NullProfile:
+    enabled = False
+    page = None
+
+    def set_page(self, page):
+        pass
+
+    def section(self, name):
+        return contextlib.nullcontext()
+
+
+NULL_PROFILE = NullProfile()
+
+
+# Process-wide collector of finished reruns
+class Profiler:
+    def __init__(self, samples_file=SAMPLES_FILE, keep=RECENT_RERUNS, max_bytes=SAMPLES_MAX_BYTES):
+        self.samples_file = samples_file
+        self.max_bytes = max_bytes
+        self.recent = deque(maxlen=keep)
+        self.all_sessions = False  # set from the admin panel
+        self._lock = threading.Lock()
+
+    def start(self, page, enabled):
+        return RerunProfile(page) if enabled or self.all_sessions else NULL_PROFILE
+
+    # Safe to call more than once; only the first call records the rerun
+    def finish(self, profile):
+        if not profile.enabled or profile.total is not None:
+            return
+        profile.total = time.perf_counter() - profile.started
+        lines = profile.folded()
+        with self._lock:
+            self.recent.append(profile)
+            try:
+                with open(self.samples_file, "a") as f:
+                    f.write("\n".join(lines) + "\n")
+                    size = f.tell()
+                if size > self.max_bytes:
+                    os.replace(self.samples_file, self.samples_file + ".1")
+            except OSError as e:
+                print(f"Error writing profile samples: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.recent)
+
+
+def profiling_requested(query_params, is_admin=False):
+    if os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0"):
+        return True
+    return is_admin and query_params.get(PROFILE_QUERY_PARAM) == "1"
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# Medal by finishing position; index 0 is everyone off the podium
+MEDALS = np.array(["", "🥇", "🥈", "🥉"])
+PODIUM = len(MEDALS) - 1
+
+
+# Ranked leaderboard: one entry per player, held as parallel arrays in rank
+# order. Built once per leaderboard version and shared by every view in the
+# worker, so nothing here should be mutated after construction.
+class Standings:
+    def __init__(self, usernames, levels, timestamps):
+        usernames = np.asarray(usernames, dtype=object)
+        levels = np.asarray(levels, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+
+        # Highest round first, then whoever reached it earliest. lexsort's last
+        # key is the primary one, and it is stable for exact ties.
+        order = np.lexsort((timestamps, -levels))
+        self._load(usernames[order], levels[order], timestamps[order])
+
+    # Arrays that are already in rank order, e.g. a published snapshot. They are
+    # used as given (no copy), so read-only views are fine.
+    @classmethod
+    def from_ranked(cls, usernames, levels, timestamps):
+        standings = cls.__new__(cls)
+        standings._load(usernames, levels, timestamps)
+        return standings
+
+    def _load(self, usernames, levels, timestamps):
+        self.usernames = usernames
+        self.levels = levels
+        self.timestamps = timestamps
+        self.positions = np.arange(1, len(levels) + 1)
+
+        # "Top N%" for every player at once; rint rounds halves to even, like round()
+        self.percentiles = np.rint(self.positions * 100 / max(len(levels), 1)).astype(np.int64)
+        self.medals = MEDALS[np.where(self.positions <= PODIUM, self.positions, 0)]
+
+        self._index = None
+        self._frame = None
+        self._csv = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        if not rows:
+            return cls([], [], [])
+        usernames, levels, timestamps = zip(*rows)
+        return cls(usernames, levels, timestamps)
+
+    def __len__(self):
+        return len(self.positions)
+
+    # Rank-order index of a player, or None if they have not scored yet
+    def index_of(self, username):
+        if self._index is None:
+            self._index = dict(zip(self.usernames.tolist(), range(len(self))))
+        return self._index.get(username)
+
+    # (position, round, percentile, medal) for one player, or None
+    def rank_of(self, username):
+        i = self.index_of(username)
+        if i is None:
+            return None
+        return int(self.positions[i]), int(self.levels[i]), int(self.percentiles[i]), str(self.medals[i])
+
+    # Display-ready table in rank order, built on first use. Timestamps stay
+    # epoch milliseconds; views format only what they render.
+    def frame(self):
+        if self._frame is None:
+            players = self.usernames.copy()
+            podium = self.medals != ""
+            players[podium] = [f"{medal} {name}" for medal, name in zip(self.medals[podium], players[podium])]
+            self._frame = pd.DataFrame({
+                "Username": self.usernames,
+                "Round": self.levels,
+                "Timestamp": self.timestamps,
+                "Position": self.positions,
+                "Rank": np.char.add("#", self.positions.astype(str)),
+                "Player": players,
+                "Medal": self.medals,
+                "Percentile": self.percentiles,
+            })
+        return self._frame
+
+    # CSV export of the full standings. Times are ISO 8601 in UTC, so the file
+    # means the same thing wherever it is opened.
+    def to_csv(self):
+        if self._csv is None:
+            export = self.frame()[["Position", "Username", "Round", "Percentile", "Medal"]].copy()
+            reached = self.timestamps.astype("datetime64[ms]")
+            export.insert(3, "Reached", np.datetime_as_string(reached, unit="ms", timezone="UTC"))
+            self._csv = export.to_csv(index=False)
+        return self._csv
+
+
+# Row-level changes from `old` to `new`, matched by username: rank-order
+# indexes into `new` of players whose round or time changed (moved) and of
+# players `old` did not have (added), and the usernames only `old` has
+# (removed). Positions are not compared; they follow from the order, so one
+# player climbing does not count as everyone they passed moving down.
+def diff(old, new):
+    where = pd.Index(old.usernames).get_indexer(new.usernames)
+    known = where >= 0
+    before = where[known]
+    changed = (old.levels[before] != new.levels[known]) | (old.timestamps[before] != new.timestamps[known])
+    moved = np.flatnonzero(known)[changed]
+    added = np.flatnonzero(~known)
+    removed = old.usernames[pd.Index(new.usernames).get_indexer(old.usernames) < 0]
+    return moved, added, removed
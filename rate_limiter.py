@@ -0,0 +1,171 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+# Default limits: a short burst of attempts, then a steady trickle
+USER_BURST = 5
+USER_REFILL_PER_SEC = 0.5  # one new attempt every 2 seconds per player
+IP_BURST = 20
+IP_REFILL_PER_SEC = 2.0  # shared by everyone behind the same address
+
+# Rejected attempts are counted in memory and written out in batches by a
+# background thread, every FLUSH_INTERVAL_SEC or sooner once a batch is full
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL_SEC = 10.0
+
+# At most this many buckets of each kind are held: full ones are dropped
+# first, then the least recently used
+MAX_BUCKETS = 10000
+
+
+# A classic token bucket; tokens are refilled lazily on access
+class TokenBucket:
+    __slots__ = ("capacity", "refill_rate", "tokens", "updated")
+
+    def __init__(self, capacity, refill_rate, now):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def is_full(self, now):
+        self.refill(now)
+        return self.tokens >= self.capacity
+
+
+# Per-user and per-IP limiter for answer submissions, shared by all sessions of the process
+class SubmissionRateLimiter:
+    def __init__(self, connection_factory,
+                 user_burst=USER_BURST, user_refill_per_sec=USER_REFILL_PER_SEC,
+                 ip_burst=IP_BURST, ip_refill_per_sec=IP_REFILL_PER_SEC,
+                 flush_batch_size=FLUSH_BATCH_SIZE, flush_interval_sec=FLUSH_INTERVAL_SEC,
+                 max_buckets=MAX_BUCKETS, clock=time.monotonic):
+        self._connection_factory = connection_factory
+        self.user_burst = user_burst
+        self.user_refill_per_sec = user_refill_per_sec
+        self.ip_burst = ip_burst
+        self.ip_refill_per_sec = ip_refill_per_sec
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.max_buckets = max_buckets
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._user_buckets = OrderedDict()  # least recently used first
+        self._ip_buckets = OrderedDict()
+        self._pending = {}  # (kind, key) -> rejected attempts not yet written
+        self._pending_total = 0
+        self._flush_due = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _bucket(self, buckets, key, capacity, refill_rate, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.max_buckets:
+                self._prune(buckets, now)
+            bucket = TokenBucket(capacity, refill_rate, now)
+            buckets[key] = bucket
+        else:
+            buckets.move_to_end(key)
+        return bucket
+
+    # Drop buckets that have fully refilled, which carry no state worth
+    # keeping; if that is not enough, drop the least recently used
+    def _prune(self, buckets, now):
+        for key in [k for k, b in buckets.items() if b.is_full(now)]:
+            del buckets[key]
+        while len(buckets) >= self.max_buckets:
+            buckets.popitem(last=False)
+
+    # Returns True if the attempt may proceed. Both buckets must have a token
+    # before either is charged, so a blocked IP does not drain the player's quota.
+    def allow(self, username, ip=None):
+        now = self._clock()
+        with self._lock:
+            buckets = [self._bucket(self._user_buckets, username, self.user_burst,
+                                    self.user_refill_per_sec, now)]
+            if ip:
+                buckets.append(self._bucket(self._ip_buckets, ip, self.ip_burst,
+                                            self.ip_refill_per_sec, now))
+            for bucket in buckets:
+                bucket.refill(now)
+
+            if all(bucket.tokens >= 1 for bucket in buckets):
+                for bucket in buckets:
+                    bucket.tokens -= 1
+                return True
+
+            self._record_rejection("user", username)
+            if ip:
+                self._record_rejection("ip", ip)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="rate-limit-flush", daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+            if self._pending_total >= self.flush_batch_size:
+                self._flush_due.set()
+        return False
+
+    def _run_flusher(self):
+        while not self._stop.is_set():
+            self._flush_due.wait(self.flush_interval_sec)
+            self._flush_due.clear()
+            self.flush()
+
+    # Stop the background flusher and write whatever is still pending
+    def close(self):
+        self._stop.set()
+        self._flush_due.set()
+        self.flush(wait=True)
+
+    def _record_rejection(self, kind, key):
+        self._pending[(kind, key)] = self._pending.get((kind, key), 0) + 1
+        self._pending_total += 1
+
+    # Write accumulated rejection counters in a single transaction
+    def flush(self, wait=False):
+        if not self._flush_lock.acquire(blocking=wait):
+            return  # another thread is already flushing
+        try:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+                self._pending_total = 0
+            if not pending:
+                return
+
+            rows = [(kind, key, count) for (kind, key), count in pending.items()]
+            try:
+                self._write(rows)
+            except Exception as e:
+                print(f"Error flushing rate limit counters: {e}")
+                # Put the counts back so they go out with the next batch
+                with self._lock:
+                    for (kind, key), count in pending.items():
+                        self._pending[(kind, key)] = self._pending.get((kind, key), 0) + count
+                        self._pending_total += count
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, rows):
+        conn = self._connection_factory()
+        try:
+            conn.executemany("""
+                INSERT INTO rate_limit_rejections (kind, key, rejected)
+                VALUES (?, ?, ?)
+                ON CONFLICT(kind, key) DO UPDATE SET
+                    rejected = rejected + excluded.rejected,
+                    last_rejected = excluded.last_rejected
+            """, rows)
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,106 @@
+import itertools
+import os
+import threading
+import time
+
+# Read-replica mode is opt-in: CRYPTIC_HUNT_READ_REPLICA=1. Shared reads
+# (questions, leaderboard, player list) then come from an in-memory copy of the
+# database that a background thread refreshes, while writes still go to disk.
+REPLICA_ENABLED = os.environ.get("CRYPTIC_HUNT_READ_REPLICA", "0") != "0"
+
+# How often the refresher asks the disk database whether anything changed
+REPLICA_POLL_INTERVAL_SEC = float(os.environ.get("CRYPTIC_HUNT_REPLICA_POLL", "1"))
+
+# Upper bound on how far behind the disk a replica read may be. If the
+# refresher falls further behind than this, reads go to disk instead.
+REPLICA_MAX_STALENESS_SEC = float(os.environ.get("CRYPTIC_HUNT_REPLICA_MAX_STALENESS", "2"))
+
+_instances = itertools.count()
+
+
+# In-memory replica of the database file. Every refresh copies the file into a
+# brand-new shared-cache memory database with the backup API and then swaps it
+# in, so a copy never runs underneath readers: connections opened on the
+# previous generation keep it alive until they close.
+class ReadReplica:
+    def __init__(self, source_factory, connect, max_staleness=REPLICA_MAX_STALENESS_SEC,
+                 poll_interval=REPLICA_POLL_INTERVAL_SEC):
+        self._source_factory = source_factory
+        self._connect = connect
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval
+        self._name = f"cryptic_hunt_replica_{os.getpid()}_{next(_instances)}"
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._anchor = None  # keeps the current memory database alive
+        self._uri = None
+        self._data_version = None
+        self._fresh_at = 0.0  # monotonic time the replica was last known to match the disk
+        self._source = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.refreshes = 0
+        self.last_copy_seconds = 0.0
+        self.disk_reads = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="read-replica", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Connection to the current replica, or None when it is missing or too stale
+    def connect(self):
+        with self._lock:
+            if self._anchor is None or time.monotonic() - self._fresh_at > self.max_staleness:
+                self.disk_reads += 1
+                return None
+            return self._connect(self._uri, uri=True, check_same_thread=False)
+
+    def staleness(self):
+        with self._lock:
+            return time.monotonic() - self._fresh_at if self._anchor is not None else None
+
+    # Copy the disk database if it changed since the last copy. PRAGMA
+    # data_version changes whenever another connection (any process) commits.
+    def refresh(self):
+        if self._source is None:
+            self._source = self._source_factory()
+        checked_at = time.monotonic()
+        data_version = self._source.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            with self._lock:
+                self._fresh_at = checked_at
+            return False
+
+        self._generation += 1
+        uri = f"file:{self._name}_{self._generation}?mode=memory&cache=shared"
+        target = self._connect(uri, uri=True, check_same_thread=False)
+        start = time.perf_counter()
+        self._source.backup(target)
+        self.last_copy_seconds = time.perf_counter() - start
+
+        with self._lock:
+            previous, self._anchor = self._anchor, target
+            self._uri = uri
+            self._data_version = data_version
+            self._fresh_at = checked_at
+            self.refreshes += 1
+        if previous is not None:
+            previous.close()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing read replica: {e}")
+                if self._source is not None:
+                    self._source.close()
+                    self._source = None
+            self._stop.wait(self.poll_interval)
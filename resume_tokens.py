@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Secret used to sign resume tokens. Every app process must share it, so it is
+# taken from the environment or from a key file in the working directory, which
+# run_workers.py creates before it starts the workers.
+SECRET_ENV_VAR = "CRYPTIC_HUNT_SECRET"
+SECRET_FILE = ".resume_secret"
+
+TOKEN_MAX_AGE_SEC = 24 * 60 * 60
+ACTIVE_PLAYER_CACHE_SIZE = 5000
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _load_secret():
+    global _secret
+    with _secret_lock:
+        if _secret is not None:
+            return _secret
+        value = os.environ.get(SECRET_ENV_VAR)
+        if value:
+            _secret = value.encode()
+            return _secret
+        if not os.path.exists(SECRET_FILE):
+            # Write the key in full under a private name, then link it into
+            # place: the link fails if another process got there first, and
+            # nobody can ever read a half-written key
+            temp = f"{SECRET_FILE}.{os.getpid()}.tmp"
+            fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            try:
+                os.link(temp, SECRET_FILE)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temp)
+        with open(SECRET_FILE) as f:
+            secret = f.read().strip().encode()
+        if not secret:
+            raise RuntimeError(f"{SECRET_FILE} is empty; delete it or set {SECRET_ENV_VAR}")
+        _secret = secret
+        return _secret
+
+
+# Create the shared key now rather than on the first token
+def ensure_secret():
+    _load_secret()
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(payload):
+    return _b64encode(hmac.new(_load_secret(), payload.encode(), hashlib.sha256).digest()[:16])
+
+
+# Token format: <base64 username>.<issued at>.<signature>
+def make_resume_token(username, now=None):
+    issued_at = int(now if now is not None else time.time())
+    payload = f"{_b64encode(username.encode())}.{issued_at}"
+    return f"{payload}.{_signature(payload)}"
+
+
+# Returns the username a token was issued for, or None if it is forged or expired
+def verify_resume_token(token, max_age=TOKEN_MAX_AGE_SEC, now=None):
+    try:
+        encoded_name, issued_at, signature = token.split(".")
+        payload = f"{encoded_name}.{issued_at}"
+        if not hmac.compare_digest(signature, _signature(payload)):
+            return None
+        now = now if now is not None else time.time()
+        if now - int(issued_at) > max_age:
+            return None
+        return _b64decode(encoded_name).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# LRU map of recently active players to their current level
+class ActivePlayerCache:
+    def __init__(self, capacity=ACTIVE_PLAYER_CACHE_SIZE):
+        self.capacity = capacity
+        self._levels = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username):
+        with self._lock:
+            level = self._levels.get(username)
+            if level is None:
+                self.misses += 1
+                return None
+            self._levels.move_to_end(username)
+            self.hits += 1
+            return level
+
+    def put(self, username, level):
+        with self._lock:
+            self._levels[username] = level
+            self._levels.move_to_end(username)
+            while len(self._levels) > self.capacity:
+                self._levels.popitem(last=False)
+
+    def discard(self, username):
+        with self._lock:
+            self._levels.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._levels.clear()
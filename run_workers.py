@@ -0,0 +1,131 @@
+"""Run several Streamlit workers against one database file.
+
+    python run_workers.py --workers 4 --base-port 8601
+
+Each worker is a separate `streamlit run player.py` process, so sessions are
+spread over several interpreters. Put a reverse proxy with sticky sessions in
+front of them (see deploy/nginx.conf): a Streamlit session lives on the
+websocket of the worker that served it and cannot move between workers.
+
+This process also publishes the ranked leaderboard to a memory-mapped
+snapshot file (<db>.snapshot by default) whenever it changes. The workers map
+that file read-only instead of each re-querying and re-ranking the leaderboard.
+Scheduled backups (backups.py) and database maintenance (maintenance.py) also
+run here rather than in every worker, as do the read-only JSON leaderboard
+endpoint, the projector view (leaderboard_api.py) and the broadcast hub that
+pushes each published leaderboard to /events subscribers (broadcast.py).
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import backups
+import broadcast
+import database
+import leaderboard_api
+import maintenance
+import resume_tokens
+from snapshot import SnapshotPublisher, SnapshotReader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several Streamlit workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--base-port", type=int, default=8601)
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address the workers bind to; keep it private to the proxy")
+    parser.add_argument("--db", default=database.DATABASE_FILE,
+                        help="database file shared by all workers")
+    parser.add_argument("--snapshot", help="leaderboard snapshot file (default: <db>.snapshot)")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="let every worker query the leaderboard itself")
+    parser.add_argument("--backup-interval", type=float, default=backups.BACKUP_INTERVAL_SEC,
+                        help="seconds between online backups, 0 to disable")
+    parser.add_argument("--api-host", default=leaderboard_api.API_HOST)
+    parser.add_argument("--api-port", type=int, default=leaderboard_api.API_PORT,
+                        help="port for the JSON leaderboard, 0 to disable")
+    parser.add_argument("--no-maintenance", action="store_true",
+                        help="do not run ANALYZE, checkpoints or vacuum in the background")
+    args = parser.parse_args()
+
+    env = dict(os.environ, CRYPTIC_HUNT_DB=os.path.abspath(args.db), CRYPTIC_HUNT_BACKUP_INTERVAL="0",
+               CRYPTIC_HUNT_MAINTENANCE="0", CRYPTIC_HUNT_API_PORT="0")
+    # The workers sit behind deploy/nginx.conf, so they may use the client
+    # address it forwards; set CRYPTIC_HUNT_TRUSTED_PROXY=0 to run them without it
+    env.setdefault("CRYPTIC_HUNT_TRUSTED_PROXY", "1")
+
+    # Create the schema once up front so workers do not race on migrations
+    database.DATABASE_FILE = env["CRYPTIC_HUNT_DB"]
+    database.initialize_db()
+    # Likewise the resume token key, which every worker must sign with
+    resume_tokens.ensure_secret()
+
+    hub = broadcast.BroadcastHub().start() if args.api_port else None
+
+    stop_publishing = threading.Event()
+    if not args.no_snapshot:
+        env["CRYPTIC_HUNT_SNAPSHOT"] = os.path.abspath(args.snapshot or env["CRYPTIC_HUNT_DB"] + ".snapshot")
+        publisher = SnapshotPublisher(env["CRYPTIC_HUNT_SNAPSHOT"], database.load_standings,
+                                      lambda: database.get_data_versions()[0],
+                                      on_publish=hub.offer if hub is not None else None)
+        publisher.publish_if_changed()
+        threading.Thread(target=publisher.run, args=(stop_publishing,), daemon=True).start()
+        database.snapshot_reader = SnapshotReader(env["CRYPTIC_HUNT_SNAPSHOT"])
+        print(f"publishing leaderboard snapshots to {env['CRYPTIC_HUNT_SNAPSHOT']}")
+
+    api = None
+    if args.api_port:
+        api = leaderboard_api.LeaderboardServer((args.api_host, args.api_port), hub=hub).start()
+        print(f"JSON leaderboard on http://{args.api_host}:{args.api_port}/leaderboard.json, "
+              f"projector view on /spectator, live updates on /events")
+
+    scheduler = None
+    if args.backup_interval > 0:
+        scheduler = backups.BackupScheduler(args.backup_interval).start()
+        print(f"backing up every {args.backup_interval:.0f}s to {os.path.abspath(backups.BACKUP_DIR)}")
+
+    upkeep = None
+    if maintenance.MAINTENANCE_ENABLED and not args.no_maintenance:
+        upkeep = maintenance.MaintenanceScheduler().start()
+        print(f"database maintenance runs when quiet, logged to {os.path.abspath(maintenance.MAINTENANCE_LOG)}")
+
+    workers = []
+    for i in range(args.workers):
+        port = args.base_port + i
+        workers.append(subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", "player.py",
+            "--server.address", args.host,
+            "--server.port", str(port),
+            "--server.headless", "true",
+        ], env=env))
+        print(f"worker {i} listening on {args.host}:{port}")
+
+    def stop(*_):
+        stop_publishing.set()
+        if scheduler is not None:
+            scheduler.stop()
+        if upkeep is not None:
+            upkeep.stop()
+        if api is not None:
+            api.shutdown()
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while all(worker.poll() is None for worker in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == "__main__":
+    main()
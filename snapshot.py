@@ -0,0 +1,189 @@
+import mmap
+import os
+import threading
+import time
+
+import numpy as np
+
+from ranking import Standings
+
+# Set by run_workers.py: the workers read the ranked leaderboard from this file
+# instead of each rebuilding it from SQLite.
+SNAPSHOT_FILE = os.environ.get("CRYPTIC_HUNT_SNAPSHOT")
+
+# A snapshot whose publisher has stopped heartbeating is ignored after this long
+SNAPSHOT_MAX_AGE_SEC = float(os.environ.get("CRYPTIC_HUNT_SNAPSHOT_MAX_AGE", "10"))
+PUBLISH_INTERVAL_SEC = 0.25
+READ_CHECK_INTERVAL_SEC = 0.25
+
+# File layout: one 64-byte header, then `count` fixed-width records in rank
+# order. Usernames are UTF-8 in USERNAME_BYTES, enough for the longest name
+# database.bootstrap_player accepts. A ranking with a longer name (one stored
+# before the cap) is not published, and the workers read the database instead.
+MAGIC = b"CHSNAP01"
+USERNAME_BYTES = 128
+HEADER = np.dtype([
+    ("magic", "S8"),
+    ("record_size", "<u4"),
+    ("reserved", "<u4"),
+    ("version", "<i8"),       # leaderboard version (last_update.version) the ranking was built from
+    ("count", "<i8"),
+    ("published_at", "<i8"),  # epoch milliseconds
+    ("padding", "S24"),
+])
+RECORD = np.dtype([
+    ("username", f"S{USERNAME_BYTES}"),
+    ("level", "<i4"),
+    ("timestamp", "<i8"),
+])
+
+
+# Write a ranking to `path`. The file is built under a temporary name and
+# renamed into place, so a published snapshot is never modified: readers that
+# still map the previous one keep a consistent view. Raises ValueError if a
+# username does not fit its record; truncating it could make two names equal.
+def write_snapshot(path, standings, version):
+    usernames = np.char.encode(standings.usernames.astype(str), "utf-8")
+    if usernames.dtype.itemsize > USERNAME_BYTES:
+        raise ValueError(f"a username is longer than {USERNAME_BYTES} bytes")
+
+    header = np.zeros(1, HEADER)
+    header["magic"] = MAGIC
+    header["record_size"] = RECORD.itemsize
+    header["version"] = version
+    header["count"] = len(standings)
+    header["published_at"] = int(time.time() * 1000)
+
+    records = np.empty(len(standings), RECORD)
+    records["username"] = usernames
+    records["level"] = standings.levels
+    records["timestamp"] = standings.timestamps
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header.tobytes())
+        f.write(records.tobytes())
+    os.replace(tmp, path)
+
+
+def check_header(header, path):
+    if header["magic"] != MAGIC or header["record_size"] != RECORD.itemsize:
+        raise ValueError(f"{path} is not a leaderboard snapshot")
+
+
+# Just the header, plus the file's mtime (the publisher's heartbeat)
+def read_header(path):
+    with open(path, "rb") as f:
+        data = f.read(HEADER.itemsize)
+        mtime = os.fstat(f.fileno()).st_mtime
+    if len(data) < HEADER.itemsize:
+        raise ValueError(f"{path} is truncated")
+    header = np.frombuffer(data, HEADER)[0]
+    check_header(header, path)
+    return header, mtime
+
+
+# Map a snapshot read-only. Returns (header, Standings); the level and
+# timestamp arrays are views straight into the mapping. Only the usernames are
+# decoded, once per snapshot.
+def read_snapshot(path):
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header = np.frombuffer(buffer, HEADER, count=1)[0]
+    check_header(header, path)
+    records = np.frombuffer(buffer, RECORD, count=int(header["count"]), offset=HEADER.itemsize)
+    usernames = np.char.decode(records["username"], "utf-8").astype(object)
+    standings = Standings.from_ranked(usernames, records["level"], records["timestamp"])
+    return header, standings
+
+
+# Runs in one process (run_workers.py): republishes whenever the leaderboard
+# version changes, and touches the file in between as a heartbeat. Each new
+# ranking is also passed to on_publish(version, standings) if given. A ranking
+# write_snapshot rejects removes the file, so readers fall back to the database
+# until the next version that fits.
+class SnapshotPublisher:
+    def __init__(self, path, load_standings, get_version, on_publish=None):
+        self.path = path
+        self._load_standings = load_standings
+        self._get_version = get_version
+        self._on_publish = on_publish
+        self.version = None
+        self.published = 0
+        self.rejected = 0
+        self._withdrawn = False
+
+    def publish_if_changed(self):
+        version = self._get_version()
+        if version != self.version:
+            standings = self._load_standings()
+            try:
+                write_snapshot(self.path, standings, version)
+                self.published += 1
+                self._withdrawn = False
+            except ValueError as e:
+                self.rejected += 1
+                if not self._withdrawn:
+                    print(f"Error publishing leaderboard snapshot, workers will read the database: {e}")
+                    self._withdraw()
+            self.version = version
+            if self._on_publish is not None:
+                self._on_publish(version, standings)
+        elif not self._withdrawn:
+            os.utime(self.path)
+
+    def _withdraw(self):
+        self._withdrawn = True
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def run(self, stop_event, interval=PUBLISH_INTERVAL_SEC):
+        while not stop_event.is_set():
+            try:
+                self.publish_if_changed()
+            except Exception as e:
+                print(f"Error publishing leaderboard snapshot: {e}")
+            stop_event.wait(interval)
+
+
+# Per-worker view of the published snapshot. get() returns None when there is
+# no usable snapshot, and callers fall back to querying the database.
+class SnapshotReader:
+    def __init__(self, path, max_age=SNAPSHOT_MAX_AGE_SEC, check_interval=READ_CHECK_INTERVAL_SEC):
+        self.path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._identity = None
+        self._standings = None
+        self._fresh = False
+        self._checked_at = 0.0
+        self.version = None
+        self.loads = 0
+
+    def get(self):
+        return self.get_versioned()[1]
+
+    # (version, Standings), or (None, None) without a usable snapshot
+    def get_versioned(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.check_interval:
+                return (self.version, self._standings) if self._fresh else (None, None)
+            self._checked_at = now
+            try:
+                # A header read per check; the records are only mapped when a new one is published
+                header, mtime = read_header(self.path)
+                if (header["version"], header["published_at"]) != self._identity:
+                    header, self._standings = read_snapshot(self.path)
+                    self._identity = (header["version"], header["published_at"])
+                    self.version = int(header["version"])
+                    self.loads += 1
+                self._fresh = time.time() - mtime <= self.max_age
+            except (OSError, ValueError) as e:
+                if self._fresh:
+                    print(f"Error reading leaderboard snapshot: {e}")
+                self._fresh = False
+            return (self.version, self._standings) if self._fresh else (None, None)
@@ -0,0 +1,133 @@
+import html
+import json
+import time
+
+from database import format_epoch_ms
+
+# Big-screen leaderboard for the venue projector and spectators. The page and
+# its table are rendered once per leaderboard version by leaderboard_api.py and
+# served with the version as ETag. The page listens on /events and, when the
+# leaderboard changes, fetches just the table rows that differ from the version
+# it shows (/spectator/rows?since=N), so an idle screen costs an open
+# connection and nothing else; if the stream is down it falls back to the same
+# request every POLL_INTERVAL_SEC. No Streamlit session is involved.
+SPECTATOR_TOP = 15
+POLL_INTERVAL_SEC = 2
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Live Leaderboard</title>
+<noscript><meta http-equiv="refresh" content="{poll}"></noscript>
+<style>
+  body {{ margin: 0; padding: 3vh 4vw; background: #1E1E1E; color: #FFFFFF;
+         font-family: system-ui, -apple-system, "Segoe UI", sans-serif; }}
+  h1 {{ font-size: 6vh; margin: 0 0 2vh; }}
+  table {{ width: 100%; border-collapse: collapse; font-size: 4.2vh; }}
+  th {{ text-align: left; color: #888888; font-weight: normal; font-size: 2.6vh;
+        border-bottom: 1px solid #404040; padding: 1vh 1vw; }}
+  td {{ padding: 1.1vh 1vw; border-bottom: 1px solid #2D2D2D; }}
+  td.rank {{ width: 12%; color: #BBBBBB; }}
+  td.round, td.reached {{ width: 16%; text-align: right; }}
+  th.round, th.reached {{ text-align: right; }}
+  tr.podium td {{ font-weight: bold; }}
+  .footer {{ margin-top: 2vh; font-size: 2vh; color: #666666; text-align: right; }}
+</style>
+</head>
+<body>
+<h1>🏆 Live Leaderboard</h1>
+<div id="board">{table}</div>
+<script>
+  // Patch the rows that changed since the version on screen, or swap in the
+  // whole table when the server sends one. The browser sends If-None-Match
+  // itself, so an unchanged leaderboard is an empty 304.
+  let shown = {version};
+  let live = false;
+  async function refresh(full) {{
+    try {{
+      const since = full || shown === null ? "" : "&since=" + shown;
+      const response = await fetch("/spectator/rows?limit={limit}" + since, {{cache: "no-cache"}});
+      if (response.status !== 200) return;
+      const update = await response.json();
+      if (update.table !== undefined) {{
+        document.getElementById("board").innerHTML = update.table;
+      }} else {{
+        for (const [position, row] of Object.entries(update.rows)) {{
+          document.getElementById("row" + position).outerHTML = row;
+        }}
+        document.getElementById("footer").outerHTML = update.footer;
+      }}
+      shown = update.version;
+    }} catch (e) {{}}
+  }}
+  if (window.EventSource) {{
+    const events = new EventSource("/events");
+    events.onopen = () => {{ live = true; refresh(false); }};
+    events.onerror = () => {{ live = false; }};
+    events.addEventListener("progress", () => refresh(false));
+    events.addEventListener("reset", () => refresh(true));
+  }}
+  setInterval(() => {{ if (!live) refresh(false); }}, {poll_ms});
+</script>
+</body>
+</html>
+"""
+
+
+def render_table(version, standings, limit=None):
+    n = min(limit or SPECTATOR_TOP, len(standings))
+    if not n:
+        return '<p style="font-size: 4vh;">No players on the leaderboard yet.</p>'.encode("utf-8")
+    return (
+        '<table><tr><th>Rank</th><th>Player</th><th class="round">Round</th>'
+        '<th class="reached">Reached</th></tr>'
+        + "".join(_render_row(standings, i) for i in range(n))
+        + '</table>' + _render_footer(version, standings)
+    ).encode("utf-8")
+
+
+def _render_row(standings, i):
+    position, medal = int(standings.positions[i]), str(standings.medals[i])
+    return (f'<tr id="row{position}" class="{"podium" if medal else ""}">'
+            f'<td class="rank">{medal or f"#{position}"}</td>'
+            f'<td>{html.escape(standings.usernames[i])}</td><td class="round">{standings.levels[i]}</td>'
+            f'<td class="reached">{format_epoch_ms(int(standings.timestamps[i]))}</td></tr>')
+
+
+def _render_footer(version, standings):
+    return (f'<div class="footer" id="footer">{len(standings)} players · leaderboard v{version} · '
+            f'updated {time.strftime("%H:%M:%S")}</div>')
+
+
+# The whole table, for a screen that has nothing to patch
+def render_rows(version, standings, limit=None):
+    return _json({"version": version, "table": render_table(version, standings, limit).decode("utf-8")})
+
+
+# Only the rows whose player, round or time differ from `old`, or None when
+# the table changed shape and has to be sent whole
+def render_changed_rows(version, standings, old, limit=None):
+    n = min(limit or SPECTATOR_TOP, len(standings))
+    if not n or n != min(limit or SPECTATOR_TOP, len(old)):
+        return None
+    changed = ((standings.usernames[:n] != old.usernames[:n]) | (standings.levels[:n] != old.levels[:n])
+               | (standings.timestamps[:n] != old.timestamps[:n])).nonzero()[0]
+    return _json({"version": version,
+                  "rows": {int(standings.positions[i]): _render_row(standings, i) for i in changed},
+                  "footer": _render_footer(version, standings)})
+
+
+def _json(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_page(version, standings, limit=None):
+    return PAGE.format(
+        table=render_table(version, standings, limit).decode("utf-8"),
+        version=json.dumps(version),
+        limit=limit or 0,
+        poll=POLL_INTERVAL_SEC,
+        poll_ms=POLL_INTERVAL_SEC * 1000,
+    ).encode("utf-8")
@@ -0,0 +1,252 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+
+# Tracing costs every statement a normalize and a timer (point lookups run about
+# a third slower), so it is off unless CRYPTIC_HUNT_SQL_TRACE=1
+TRACE_ENABLED = os.environ.get("CRYPTIC_HUNT_SQL_TRACE", "0") not in ("", "0")
+SLOW_QUERY_MS = float(os.environ.get("CRYPTIC_HUNT_SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG = os.environ.get("CRYPTIC_HUNT_SLOW_QUERY_LOG", "slow_queries.log")
+RECENT_SLOW_QUERIES = 200
+
+# Full scans of these tables get flagged; they grow with the number of players
+WATCHED_TABLES = ("leaderboard", "users")
+
+# Statements worth asking the planner about
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE|INSERT)\b", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?! USING (?:COVERING )?INDEX)")
+
+
+# Collapse whitespace and replace literals, so one query shape is one entry
+def normalize_sql(sql):
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+# Tables in WATCHED_TABLES that a query plan reads without an index
+def full_scans(plan):
+    tables = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match and match.group(1) in WATCHED_TABLES:
+            tables.append(match.group(1))
+    return tables
+
+
+class QueryStats:
+    __slots__ = ("sql", "calls", "total", "max", "rows", "plan")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.plan = None  # EXPLAIN QUERY PLAN details, captured on first use
+
+
+# One statement execution; finished when its rows have been read or the cursor moves on
+class StatementRecord:
+    __slots__ = ("sql", "started", "duration", "rows")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.started = time.time()
+        self.duration = 0.0
+        self.rows = 0
+
+
+# Process-wide aggregate of traced statements
+class SqlTracer:
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_QUERY_LOG):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self._lock = threading.Lock()
+        self.queries = {}
+        self.slow = deque(maxlen=RECENT_SLOW_QUERIES)
+
+    def needs_plan(self, sql):
+        with self._lock:
+            stats = self.queries.get(sql)
+            return stats is None or stats.plan is None
+
+    def set_plan(self, sql, plan):
+        with self._lock:
+            self.queries.setdefault(sql, QueryStats(sql)).plan = plan
+
+    def finish(self, record):
+        with self._lock:
+            stats = self.queries.get(record.sql)
+            if stats is None:
+                stats = self.queries[record.sql] = QueryStats(record.sql)
+            stats.calls += 1
+            stats.total += record.duration
+            stats.max = max(stats.max, record.duration)
+            stats.rows += record.rows
+            slow = record.duration * 1000 >= self.slow_ms
+            if slow:
+                self.slow.append(record)
+        if slow and self.slow_log:
+            entry = {"at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.started)),
+                     "ms": round(record.duration * 1000, 2), "rows": record.rows, "sql": record.sql}
+            try:
+                with open(self.slow_log, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print(f"Error writing slow query log: {e}")
+
+    # Query shapes whose captured plan full-scans a watched table
+    def full_scans(self):
+        with self._lock:
+            return {sql: full_scans(stats.plan) for sql, stats in self.queries.items()
+                    if stats.plan and full_scans(stats.plan)}
+
+    def snapshot(self):
+        with self._lock:
+            return ([(s.sql, s.calls, s.total, s.max, s.rows, s.plan) for s in self.queries.values()],
+                    list(self.slow))
+
+    def reset(self):
+        with self._lock:
+            self.queries.clear()
+            self.slow.clear()
+
+
+tracer = SqlTracer()
+
+
+class TracingCursor(sqlite3.Cursor):
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._record = None
+
+    def _finish(self):
+        if self._record is not None:
+            tracer.finish(self._record)
+            self._record = None
+
+    def _capture_plan(self, sql, normalized, parameters):
+        if not _EXPLAINABLE.match(sql) or not tracer.needs_plan(normalized):
+            return
+        try:
+            rows = self.connection.cursor().execute_untraced("EXPLAIN QUERY PLAN " + sql, parameters)
+            tracer.set_plan(normalized, [row[3] for row in rows])
+        except sqlite3.Error:
+            tracer.set_plan(normalized, [])
+
+    def execute_untraced(self, sql, parameters=()):
+        return super().execute(sql, parameters).fetchall()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        normalized = normalize_sql(sql)
+        self._capture_plan(sql, normalized, parameters)
+        record = StatementRecord(normalized)
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            record.duration = time.perf_counter() - start
+            self._record = record
+        if self.description is None:
+            self._finish()  # no result rows to wait for
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        record = StatementRecord(normalize_sql(sql))
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            record.duration = time.perf_counter() - start
+            self._record = record
+            self._finish()
+        return self
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        result = fetch(*args)
+        if self._record is not None:
+            self._record.duration += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(super().fetchone)
+        if self._record is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed_fetch(super().fetchmany, size if size is not None else self.arraysize)
+        if self._record is not None:
+            self._record.rows += len(rows)
+            if not rows:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(super().fetchall)
+        if self._record is not None:
+            self._record.rows += len(rows)
+            self._finish()
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+# Connection whose cursors report to the tracer; pass as factory= to sqlite3.connect
+class TracingConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self, factory=TracingCursor):
+        cursor = super().cursor(factory)
+        if isinstance(cursor, TracingCursor):
+            self._cursors.add(cursor)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        for cursor in list(self._cursors):
+            cursor._finish()
+        self._cursors.clear()
+        super().close()
+
+
+def connect(database, **kwargs):
+    if TRACE_ENABLED:
+        kwargs.setdefault("factory", TracingConnection)
+    return sqlite3.connect(database, **kwargs)
+
+
+# For tests: fail if a query's plan full-scans one of the watched tables
+def assert_uses_index(conn, sql, parameters=()):
+    plan = [row[3] for row in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters)]
+    scanned = full_scans(plan)
+    if scanned:
+        raise AssertionError(f"full scan of {', '.join(scanned)} in {normalize_sql(sql)!r}: {plan}")
+    return plan
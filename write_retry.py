@@ -0,0 +1,216 @@
+import atexit
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+# Retries and a circuit breaker for the player writes (joining, advancing a
+# level). A write that hits "database is locked" is retried up to WRITE_RETRIES
+# times with jittered exponential backoff, each attempt waiting at most
+# BUSY_TIMEOUT_MS for the lock. After BREAKER_FAILURES writes in a row give up,
+# the breaker opens for BREAKER_COOLDOWN_SEC: writes stop waiting on the
+# database and go to an in-memory queue instead, which a background thread
+# applies in order once the database lets it. While anything is queued, new
+# writes queue behind it so one player's writes never overtake each other.
+# At exit the queue is given up to SHUTDOWN_DRAIN_SEC to empty, and a queued
+# write that fails for good is passed to the drop listeners, so whoever
+# reported it as done can take that back.
+WRITE_RETRIES = int(os.environ.get("CRYPTIC_HUNT_WRITE_RETRIES", "4"))
+BACKOFF_BASE_SEC = float(os.environ.get("CRYPTIC_HUNT_WRITE_BACKOFF_MS", "25")) / 1000
+BACKOFF_MAX_SEC = 1.0
+BUSY_TIMEOUT_MS = int(os.environ.get("CRYPTIC_HUNT_WRITE_BUSY_TIMEOUT_MS", "1000"))
+BREAKER_FAILURES = int(os.environ.get("CRYPTIC_HUNT_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_SEC = float(os.environ.get("CRYPTIC_HUNT_BREAKER_COOLDOWN", "5"))
+WRITE_QUEUE_SIZE = int(os.environ.get("CRYPTIC_HUNT_WRITE_QUEUE", "500"))
+SHUTDOWN_DRAIN_SEC = float(os.environ.get("CRYPTIC_HUNT_WRITE_DRAIN_SEC", "10"))
+
+
+# Raised when a write can neither reach the database nor be queued
+class WriteUnavailable(Exception):
+    pass
+
+
+def is_lock_error(e):
+    message = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+# Full jitter: a random wait up to the exponential step, so writers that
+# collided do not retry in lockstep
+def backoff(attempt, base=BACKOFF_BASE_SEC, cap=BACKOFF_MAX_SEC):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# Closed: writes go to the database. Open: they do not, until the cooldown
+# has passed. Half-open: one trial write decides whether to close or reopen.
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN_SEC):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self.opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial:
+                self._trial = False
+                self._opened_at = time.monotonic()  # the trial failed: wait another cooldown
+                self.opened += 1
+            elif self._opened_at is None and self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+
+class WriteGuard:
+    def __init__(self, retries=WRITE_RETRIES, breaker=None, queue_size=WRITE_QUEUE_SIZE):
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker()
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._flusher = None
+        self.drop_listeners = []  # listener(write, args) for each queued write dropped
+        self.writes = 0
+        self.retried = 0
+        self.gave_up = 0
+        self.fast_failed = 0
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # Run write(*args). If the database is saturated and `queued` is given,
+    # the write is queued instead and queued() is returned in its place;
+    # otherwise WriteUnavailable is raised. Other errors propagate as usual.
+    def run(self, write, args=(), queued=None):
+        self.writes += 1
+        if self._queue.unfinished_tasks == 0 and self.breaker.allow():
+            try:
+                result = self._attempt(write, args)
+                self.breaker.success()
+                return result
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                self.gave_up += 1
+                self.breaker.failure()
+        else:
+            self.fast_failed += 1
+        if queued is None:
+            raise WriteUnavailable("the database is too busy to take this write")
+        self._enqueue(write, args)
+        return queued()
+
+    def _attempt(self, write, args):
+        for attempt in range(self.retries + 1):
+            try:
+                return write(*args)
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e) or attempt == self.retries:
+                    raise
+                self.retried += 1
+                time.sleep(backoff(attempt))
+
+    def _enqueue(self, write, args):
+        try:
+            self._queue.put_nowait((write, args))
+        except queue.Full:
+            self.rejected += 1
+            raise WriteUnavailable("the database is too busy and the write queue is full")
+        self.queued += 1
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush, name="write-queue", daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+
+    @property
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    # Apply queued writes in order, each once the breaker lets it through
+    def _flush(self):
+        while True:
+            write, args = self._queue.get()
+            while True:
+                if not self.breaker.allow():
+                    time.sleep(0.1)
+                    continue
+                try:
+                    self._attempt(write, args)
+                    self.breaker.success()
+                    self.flushed += 1
+                except sqlite3.OperationalError as e:
+                    if is_lock_error(e):
+                        self.breaker.failure()
+                        continue
+                    self._drop(write, args, e)
+                except Exception as e:
+                    self._drop(write, args, e)
+                break
+            self._queue.task_done()
+
+    def _drop(self, write, args, error):
+        print(f"Error applying queued write: {error}")
+        self.dropped += 1
+        for listener in self.drop_listeners:
+            try:
+                listener(write, args)
+            except Exception as e:
+                print(f"Error reporting dropped write: {e}")
+
+    # Wait up to `timeout` seconds for the queue to empty; the flusher is a
+    # daemon thread, so whatever is still queued when the process ends is lost
+    def close(self, timeout=SHUTDOWN_DRAIN_SEC):
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self.pending:
+            print(f"Error draining the write queue: {self.pending} writes not applied")
+
+    # Counters for the admin panel
+    def stats(self):
+        return {
+            "breaker": self.breaker.state,
+            "opened": self.breaker.opened,
+            "writes": self.writes,
+            "retried": self.retried,
+            "gave_up": self.gave_up,
+            "fast_failed": self.fast_failed,
+            "queued": self.queued,
+            "pending": self.pending,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+# Shared by the player writes in this process
+guard = WriteGuard()